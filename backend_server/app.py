@@ -13,7 +13,10 @@ from flask_jwt_extended import JWTManager, decode_token
 from backend_server.config import Config
 from backend_server.routes import register_routes
 from backend_server.utils.extensions import db
-from backend_server.services.socketio_ref import socketio
+from backend_server.utils.database_tools.db_query import register_session_options
+from backend_server.services.socketio_ref import socketio, client_manager
+from backend_server.utils.socket_emit import join_and_drain, leave, socket_room
+from backend_server.utils.socket_serializer import encode_payload, negotiate
 
 from backend_server.services.make_celery import celery  # ✅ only the instance, no import of celery_worker
 from backend_server.services.init_celery import init_celery
@@ -50,12 +53,25 @@ def create_app():
 
     from backend_server.models.user import User
     with app.app_context():
+        register_session_options(db.engine)
         db.create_all()
+        if app.config["DB_BOOTSTRAP_ON_START"] and db.engine.dialect.name == "postgresql":
+            from backend_server.utils.database_tools.bootstrap import bootstrap_database
+            bootstrap_database()
 
     register_routes(app)
 
+    if app.config["ESSENTIAL_AUTOCOMPLETE_RELOAD_SIGNAL"]:
+        from backend_server.utils.database_tools.essential_autocomplete import install_reload_signal
+        install_reload_signal(app.config["ESSENTIAL_AUTOCOMPLETE_RELOAD_SIGNAL"])
+
+    if app.config["VECTOR_WARMUP"]:
+        import threading
+        from backend_server.services.vector_store import warmup
+        threading.Thread(target=warmup, daemon=True).start()
+
     # bind SocketIO to Flask app
-    socketio.init_app(app)
+    socketio.init_app(app, client_manager=client_manager)
     return app
 
 app = create_app()
@@ -74,8 +90,12 @@ def handle_connect(auth=None):
     try:
         decoded = decode_token(token)
         user_id = str(decoded["sub"])
+        from flask import request
         from flask_socketio import join_room
-        join_room(user_id)
+        # Optional binary payloads for this socket only (auth.encoding="msgpack")
+        encoding = negotiate(auth.get("encoding"))
+        join_room(socket_room(user_id, encoding))
+        join_and_drain(user_id, request.sid, encoding)  # the user room has no mailbox; records the encoding
         logger.info(f"User {user_id} connected to WebSocket")
         #emit("connected", {"message": f"Connected as {user_id}"}, room=user_id)
     except Exception as e:
@@ -95,10 +115,17 @@ def handle_join(data):
         decoded = decode_token(token)
         user_id = str(decoded["sub"])
         room_name = f"{user_id}-{upc_or_id}"
+        from flask import request
         from flask_socketio import join_room, emit
-        join_room(room_name)
+        # Optional binary payloads for this socket only: the client sends encoding="msgpack";
+        # room_ready says what was granted
+        encoding = negotiate(data.get("encoding"))
+        join_room(socket_room(room_name, encoding))
         logger.info(f"User {user_id} joined room {room_name}")
-        emit("room_ready", {"room": room_name}, room=room_name)
+        emit("room_ready", {"room": room_name, "encoding": encoding})
+        # Replay events a task emitted before this client joined (to this client only)
+        for event, payload in join_and_drain(room_name, request.sid, encoding):
+            emit(event, encode_payload(payload, encoding))
     except Exception as e:
         logger.error(f"Join room error: {e}")
 
@@ -114,12 +141,25 @@ def handle_leave(data):
         decoded = decode_token(token)
         user_id = str(decoded["sub"])
         room_name = f"{user_id}-{upc_or_id}"
+        from flask import request
         from flask_socketio import leave_room
-        leave_room(room_name)
+        for encoding in ("json", "msgpack"):
+            leave_room(socket_room(room_name, encoding))
+        leave([room_name], request.sid)
         logger.info(f"User {user_id} left room {room_name}")
         #emit("left_room", {"room": room_name}, room=user_id)
     except Exception as e:
         logger.error(f"Leave room error: {e}")
 
+# --- DISCONNECT ---
+@socketio.on("disconnect")
+def handle_disconnect():
+    try:
+        from flask import request
+        from flask_socketio import rooms
+        leave([room for room in rooms() if room != request.sid], request.sid)
+    except Exception as e:
+        logger.error(f"Disconnect error: {e}")
+
 if __name__ == "__main__":
     socketio.run(app, host="0.0.0.0", port=5000, use_reloader=False, debug=True)
@@ -6,6 +6,7 @@ load_dotenv()
 class Config:
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+    OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
     NIH_API_KEY = os.getenv("NIH_API_KEY")
     NIH_API_URL = "https://api.ods.od.nih.gov/dsld/v9"
 
@@ -15,4 +16,72 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'super-secret'  # For JWT tokens
+
+    # Create extensions/indexes/helper tables at startup (Postgres only)
+    DB_BOOTSTRAP_ON_START = os.getenv("DB_BOOTSTRAP_ON_START", "True").lower() == "true"
+
+    # Ratings read-through cache (seconds)
+    RATING_CACHE_TTL = int(os.getenv("RATING_CACHE_TTL", 6 * 60 * 60))
+    RATING_CACHE_SYNC_INTERVAL = int(os.getenv("RATING_CACHE_SYNC_INTERVAL", 60))
+    # updated_at is the writer's transaction start, so a row can commit after a later
+    # change scan started; each scan looks this many seconds behind the previous one
+    RATING_CHANGE_OVERLAP_SECONDS = int(os.getenv("RATING_CHANGE_OVERLAP_SECONDS", 5 * 60))
+
+    # Labels fetched from NIH for ids missing from the labels table are cached in Redis (seconds)
+    NIH_LABEL_CACHE_TTL = int(os.getenv("NIH_LABEL_CACHE_TTL", 7 * 24 * 60 * 60))
+
+    # In-process ingredient -> label index for recommendation queries
+    LABEL_INDEX_ENABLED = os.getenv("LABEL_INDEX_ENABLED", "False").lower() == "true"
+    LABEL_INDEX_REFRESH_SECONDS = int(os.getenv("LABEL_INDEX_REFRESH_SECONDS", 60 * 60))
+
+    # Materialized essential leaderboards older than this are recomputed on read (seconds)
+    LEADERBOARD_MAX_AGE_SECONDS = int(os.getenv("LEADERBOARD_MAX_AGE_SECONDS", 60 * 60))
+
+    # Process-level snapshot of ingredient_frequency (seconds between reloads)
+    INGREDIENT_FREQUENCY_REFRESH_SECONDS = int(os.getenv("INGREDIENT_FREQUENCY_REFRESH_SECONDS", 15 * 60))
+
+    # In-process autocomplete for /api/essentials/search
+    ESSENTIAL_AUTOCOMPLETE_ENABLED = os.getenv("ESSENTIAL_AUTOCOMPLETE_ENABLED", "True").lower() == "true"
+    ESSENTIAL_AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv("ESSENTIAL_AUTOCOMPLETE_REFRESH_SECONDS", 15 * 60))
+    ESSENTIAL_AUTOCOMPLETE_RELOAD_SIGNAL = os.getenv("ESSENTIAL_AUTOCOMPLETE_RELOAD_SIGNAL")  # e.g. "SIGUSR2"
+
+    # Per-room pending-event mailbox replayed on join_room (seconds, events per room)
+    SOCKET_MAILBOX_TTL = int(os.getenv("SOCKET_MAILBOX_TTL", 60))
+    SOCKET_MAILBOX_MAX = int(os.getenv("SOCKET_MAILBOX_MAX", 50))
+    # Sockets joined to a room are tracked so only events nobody received are mailboxed.
+    # The web process refreshes its rooms every TTL/3, so sids left by a restarted or
+    # crashed process stop suppressing the mailbox after this long (seconds)
+    SOCKET_MEMBERS_TTL = int(os.getenv("SOCKET_MEMBERS_TTL", 30))
+
+    # Socket.IO message-queue encoding: "json" (python-socketio default) or "msgpack".
+    # Switch to msgpack only once every web/worker process runs a build that decodes it.
+    SOCKETIO_MQ_ENCODING = os.getenv("SOCKETIO_MQ_ENCODING", "json")
+
+    # Coalesced product_bundle delivery for scans (seconds to collect stage results)
+    PRODUCT_BUNDLE_WINDOW = float(os.getenv("PRODUCT_BUNDLE_WINDOW", 0.5))
+    PRODUCT_BUNDLE_TTL = int(os.getenv("PRODUCT_BUNDLE_TTL", 5 * 60))
+
+    # In-flight task coalescing: lifetime of a (task, product) claim if its worker dies (seconds)
+    INFLIGHT_TTL = int(os.getenv("INFLIGHT_TTL", 120))
+
+    # Load the embedding model / vector store at process start instead of on first query
+    VECTOR_WARMUP = os.getenv("VECTOR_WARMUP", "False").lower() == "true"
+
+    # Vector search backend: "chroma" or "numpy" (memory-mapped exact search)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./vector_index")
+
+    # LLM client: deadlines (seconds), concurrent requests per process, retries on 429/5xx
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+
+    # Content-addressed LLM response cache (seconds)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 60 * 60))
+
+    # LRU sizes for the vector_search query-embedding and result caches
+    VECTOR_QUERY_CACHE_SIZE = int(os.getenv("VECTOR_QUERY_CACHE_SIZE", 2048))
+    VECTOR_RESULT_CACHE_SIZE = int(os.getenv("VECTOR_RESULT_CACHE_SIZE", 1024))
     
\ No newline at end of file
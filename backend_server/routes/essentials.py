@@ -10,6 +10,7 @@ from backend_server.services.tasks import get_products_for_essential
 from backend_server.config import Config
 from backend_server.utils import api_requests
 from backend_server.utils.database_tools.search_for_essential import search_essentials
+from backend_server.utils.database_tools.essential_autocomplete import get_autocomplete
 from backend_server.services.essential_description import get_essential_description
 
 essentials_bp = Blueprint("essentials", __name__)
@@ -43,7 +44,14 @@ def search():
     if not q:
         return jsonify({"error": "Missing query"}), 400
     
-    results = search_essentials(q)
+    results = None
+    if Config.ESSENTIAL_AUTOCOMPLETE_ENABLED:
+        try:
+            results = get_autocomplete().search(q)
+        except Exception as e:
+            print("Autocomplete unavailable, falling back to DB search:", e)
+    if results is None:
+        results = search_essentials(q)
     print(results)
 
     return {"results": results}
\ No newline at end of file
@@ -1,17 +1,18 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 import requests
+import uuid
 
 from backend_server.services.gpt_service import analyze_supplements, recommend_supplement_by_question
 from backend_server.services.llm_client import ask_openrouter
 from backend_server.services.vector_store import vector_search
 from backend_server.utils.barcodes import format_barcode
-from backend_server.services.tasks import fetch_label_details, recommend_similar_products, openfoodfacts_request, recommend_similar_by_essentials
+from backend_server.services.tasks import fetch_label_details, recommend_similar_products, openfoodfacts_request, recommend_similar_by_essentials, stream_recommendations, enqueue_coalesced
 from backend_server.config import Config
 from backend_server.utils import api_requests
 from backend_server.utils import raw_db
 
-from backend_server.utils.database_tools.get_rating import get_ratings_for_id
+from backend_server.utils.database_tools.get_rating import get_ratings_for_ids
 
 NIH_API_URL = Config.NIH_API_URL
 
@@ -35,6 +36,14 @@ def recommend():
     if not question:
         return jsonify({"error": "Missing question"}), 400
 
+    if data.get("stream"):
+        # Answer immediately; recommendations arrive over Socket.IO in the user's room
+        verify_jwt_in_request()
+        user_id = str(get_jwt_identity())
+        job_id = uuid.uuid4().hex
+        stream_recommendations.delay(user_id, question, job_id)
+        return jsonify({"job_id": job_id, "room": user_id}), 202
+
     response = recommend_supplement_by_question(question)
     print(response)
 
@@ -76,6 +85,8 @@ def lookup():
         print(f"looking for", NIH_API_URL + f"/search-filter?q=%22{barcode}%22")
         response = raw_db.get_label_by_upc(barcode)
         #get(NIH_API_URL + f"/search-filter?q=%22{barcode}%22", timeout=15)
+        if response is None:
+            return jsonify({"error": "No product found"}), 404
         response.raise_for_status()
         resp_json = response.json()
         products = resp_json.get("hits", [])
@@ -102,10 +113,13 @@ def lookup():
 
         # Trigger background task to fetch /label details
         try:
-            fetch_label_details.delay(str(user_id) + "-" + str(old_bar), str(_id), recommend_after=True)
+            # Repeated scans of a product share one in-flight run instead of enqueueing copies
+            room = str(user_id) + "-" + str(old_bar)
+            bundle = bool(data.get("bundle"))
+            enqueue_coalesced(fetch_label_details, str(_id), room, room, str(_id), recommend_after=True, bundle=bundle)
             #recommend_similar_products.delay(str(user_id), str(_id), p.get("fullName", ""), p.get("brandName", ""))
             #recommend_similar_by_essentials.delay(str(user_id), [p.get("fullName", ""), p.get("brandName", "")])
-            openfoodfacts_request.delay(str(user_id) + "-" + str(old_bar), str(barcode))
+            enqueue_coalesced(openfoodfacts_request, str(barcode), room, room, str(barcode))
         except Exception as e:
             # if Celery is not available, still continue (optionally do synchronous fallback)
             print("Warning: failed to queue background task:", e)
@@ -143,10 +157,10 @@ def search():
     
     results["hits"] = results_new
 
-    for i, hit in enumerate(results["hits"]):
-        hit_id = str(hit["_id"])
-        hit["ratings"] = get_ratings_for_id(hit_id)
-        results["hits"][i] = hit
+    # One query for every hit instead of one per hit
+    ratings = get_ratings_for_ids([str(hit["_id"]) for hit in results["hits"]])
+    for hit in results["hits"]:
+        hit["ratings"] = ratings.get(str(hit["_id"]))
 
     # sort from highest to lowest
     results["hits"].sort(key=lambda item: -item["ratings"]["overall_score"])
@@ -170,7 +184,8 @@ def lookupbyid():
     try:
         # Trigger background task to fetch /label details
         try:
-            fetch_label_details.delay(str(user_id) + "-" + str(dsld_id), str(dsld_id), recommend_after=True)
+            room = str(user_id) + "-" + str(dsld_id)
+            enqueue_coalesced(fetch_label_details, str(dsld_id), room, room, str(dsld_id), recommend_after=True, bundle=bool(data.get("bundle")))
             #recommend_similar_products.delay(str(user_id), str(_id), p.get("fullName", ""), p.get("brandName", ""))
             #openfoodfacts_request.delay(str(user_id), str(barcode))
         except Exception as e:
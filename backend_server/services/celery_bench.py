@@ -0,0 +1,46 @@
+"""
+Task throughput benchmark for a Celery queue.
+
+Enqueues N tasks that each wait like an upstream call (NIH, OFF, OpenRouter)
+and reports tasks per second once all of them have finished. Workers do not
+load this module by default; start the worker for the queue as in the
+Procfile plus ``--include backend_server.services.celery_bench``, then run
+
+    python -m backend_server.services.celery_bench --queue interactive -n 200 --sleep 0.2
+
+With --pool=solo the rate is bounded by 1/sleep; with --pool=threads it
+scales with --concurrency until the broker round trip dominates.
+"""
+
+import argparse
+import time
+
+from backend_server.services.celery_worker import celery
+
+
+@celery.task
+def bench_io(seconds=0.2):
+    """No-op task that waits like a network call."""
+    time.sleep(seconds)
+    return seconds
+
+
+def run(queue, count, sleep):
+    start = time.perf_counter()
+    results = [bench_io.apply_async((sleep,), queue=queue) for _ in range(count)]
+    enqueued = time.perf_counter() - start
+    for result in results:
+        result.get(timeout=max(60, count * sleep))
+    elapsed = time.perf_counter() - start
+    return {"queue": queue, "tasks": count, "sleep": sleep,
+            "enqueue_seconds": round(enqueued, 3), "total_seconds": round(elapsed, 3),
+            "tasks_per_second": round(count / elapsed, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--queue", default="interactive")
+    parser.add_argument("-n", "--count", type=int, default=100)
+    parser.add_argument("--sleep", type=float, default=0.2, help="seconds each task waits")
+    args = parser.parse_args()
+    print(run(args.queue, args.count, args.sleep))
@@ -3,19 +3,29 @@
 Celery Task base with lazy Flask app binding to avoid circular import.
 """
 
+import threading
+
+from celery.signals import worker_init
+
+from backend_server.config import Config
 from backend_server.services.make_celery import celery
 
 _flask_app = None
+_flask_app_lock = threading.Lock()  # thread pools start several tasks at once
 
 def _ensure_flask_app():
     """Create Flask app and bind Celery if not already done."""
     global _flask_app
     if _flask_app is None:
-        from backend_server.app import create_app
-        from backend_server.services.init_celery import init_celery
+        with _flask_app_lock:
+            if _flask_app is not None:
+                return
+            from backend_server.app import create_app
+            from backend_server.services.init_celery import init_celery
 
-        _flask_app = create_app()
-        init_celery(celery, _flask_app)
+            app = create_app()
+            init_celery(celery, app)
+            _flask_app = app
 
 class ContextTask(celery.Task):
     """Wrap tasks in Flask app context."""
@@ -26,5 +36,12 @@ class ContextTask(celery.Task):
 
 celery.Task = ContextTask
 
+@worker_init.connect
+def _warmup_vector_store(**kwargs):
+    """Optional warmup hook; otherwise the model loads on the first task that needs it."""
+    if Config.VECTOR_WARMUP:
+        from backend_server.services.vector_store import warmup
+        warmup()
+
 # IMPORTANT: import tasks here AFTER Task is set
 import backend_server.services.tasks
@@ -1,10 +1,34 @@
-from sentence_transformers import SentenceTransformer
+import logging
+import threading
 
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """
+    Load the SentenceTransformer on first use.
+    One instance per process, shared by all threads.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                logger.info("Loading embedding model %s", MODEL_NAME)
+                _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+def warmup():
+    """Load the model and run one encode so the first real call doesn't pay for it."""
+    get_model().encode(["warmup"], convert_to_numpy=True)
 
 def embed_text(texts):
     """
     Accepts a list of texts (strings), returns list of embeddings.
     """
-    embeddings = model.encode(texts, convert_to_numpy=True)
-    return embeddings
\ No newline at end of file
+    embeddings = get_model().encode(texts, convert_to_numpy=True)
+    return embeddings
@@ -1,15 +1,33 @@
 from flask import jsonify
 
-from backend_server.services.llm_client import ask_openrouter
+from backend_server.services.llm_client import ask_openrouter, client as llm_client
+from backend_server.utils.single_flight import single_flight
 from backend_server.utils.database_tools.top_by_essentials import get_ingredient_ids
 from backend_server.utils.database_tools.ingredient_descriptions import get_ingredient_description, set_ingredient_description
 
+# The lock must outlive the slowest LLM call (all retries timing out) plus the DB
+# reads/writes around it, and waiters hold out as long as the lock can
+DESCRIPTION_LOCK_TTL = int(llm_client.max_request_seconds()) + 30
+
 def _get_new_description(essential_name):
     response = ask_openrouter(f"""
 Give me a short, roughly 3-sentence blurb about {essential_name}, as it is used in supplements. Describe its common function in supplements (for humans), the common positive effects it has on humans, and any common potential risks that can occur from taking supplements which contain it. Your response should not contain any markdown formatting, newline characters, tab characters, or other attempts at formatting.
 """)
 
     return response
+
+
+def _fill_description(essential_id, essential_name):
+    # Another caller may have written it while we were waiting for the lock
+    desc = get_ingredient_description(essential_id)
+    if desc:
+        return desc
+
+    desc = _get_new_description(essential_name)
+    print(f"[[[NEW DESC: {desc}")
+
+    set_ingredient_description(essential_id, desc)
+    return desc
     
 
 def get_essential_description(essential_name):
@@ -23,9 +41,12 @@ def get_essential_description(essential_name):
     print(f"[[[OLD DESC: {desc}")
 
     if not desc:
-        desc = _get_new_description(essential_name)
-        print(f"[[[NEW DESC: {desc}")
-
-        set_ingredient_description(essential_id, desc)
+        # Only one request generates a missing description; the rest wait for it
+        desc = single_flight(
+            f"essential_description:{essential_id}",
+            lambda: _fill_description(essential_id, essential_name),
+            deadline=DESCRIPTION_LOCK_TTL,
+            lock_ttl=DESCRIPTION_LOCK_TTL,
+        )
     
     return desc
@@ -1,5 +1,6 @@
 from backend_server.services.vector_store import vector_search
-from backend_server.services.llm_client import ask_openrouter
+from backend_server.services.llm_client import ask_openrouter, stream_openrouter
+from backend_server.utils.incremental_json import ArrayItemStream
 
 def analyze_supplements(supplements):
     # Placeholder for GPT logic — right now, just returns fake ratings
@@ -12,7 +13,7 @@ def analyze_supplements(supplements):
         })
     return {"results": results}
 
-def recommend_supplement_by_question(question):
+def _recommendation_prompt(question):
     
     # Search vector DB for relevant docs
     docs = vector_search(question, top_k=5)
@@ -23,7 +24,7 @@ def recommend_supplement_by_question(question):
     print(f"context: {context}")
 
     # Ask OpenRouter LLM with context + question
-    prompt = f"""
+    return f"""
 You are a helpful assistant providing supplement recommendations based on trusted wellness documents.
 
 Context:
@@ -41,20 +42,20 @@ Please answer in JSON format like this:
 }}
 """
 
-    
-    # TEMPORARY: USE FIXED RESPONSE
-    response = """{
-  "recommendations": [
-    {"name": "Magnesium Citrate", "rating": 4.5, "link": "https://example.com/magnesium-citrate"},
-    {"name": "Magnesium Glycinate", "rating": 4.7, "link": "https://example.com/magnesium-glycinate"},
-    {"name": "Magnesium Oxide", "rating": 4.0, "link": "https://example.com/magnesium-oxide"}
-  ]
-}"""
-
-    response = ask_openrouter(prompt)
+def recommend_supplement_by_question(question):
+    response = ask_openrouter(_recommendation_prompt(question))
 
     return response
 
+def stream_recommendations_by_question(question):
+    """
+    Yield each recommendation dict as soon as the LLM has finished writing it.
+    """
+    parser = ArrayItemStream()
+    for chunk in stream_openrouter(_recommendation_prompt(question)):
+        for recommendation in parser.feed(chunk):
+            yield recommendation
+
 def fetch_similar_products(product_name, brand_name):
     # Search vector DB for relevant docs
     docs = vector_search(product_name, top_k=5)
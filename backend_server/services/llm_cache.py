@@ -0,0 +1,75 @@
+"""
+Content-addressed cache for LLM completions.
+
+Keys are a sha256 of the full request payload (model, messages and sampling
+parameters), so any change to the prompt or parameters is a different entry.
+Values are zlib-compressed completion text stored in Redis with a TTL.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import zlib
+
+import redis
+
+from backend_server.config import Config
+
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+LLM_CACHE_PREFIX = "llm:resp:"
+LLM_CACHE_STATS_KEY = "llm:cache:stats"  # hash of hits/misses across all processes
+
+_local_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def cache_key(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return LLM_CACHE_PREFIX + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _record(field):
+    _local_stats[field] += 1
+    try:
+        redis_client.hincrby(LLM_CACHE_STATS_KEY, field, 1)
+    except redis.RedisError:
+        pass
+
+
+def get(key):
+    """Return the cached completion text, or None on a miss (or if Redis is down)."""
+    try:
+        blob = redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning("LLM cache unavailable: %s", e)
+        _record("errors")
+        return None
+
+    if blob is None:
+        _record("misses")
+        return None
+    _record("hits")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def put(key, text, ttl=None):
+    try:
+        redis_client.setex(key, ttl or Config.LLM_CACHE_TTL, zlib.compress(text.encode("utf-8")))
+    except redis.RedisError as e:
+        logger.warning("Failed to cache LLM response: %s", e)
+
+
+def get_stats():
+    """Hit/miss counters for this process and for all processes (from Redis)."""
+    stats = {"process": dict(_local_stats)}
+    try:
+        shared = redis_client.hgetall(LLM_CACHE_STATS_KEY)
+        stats["all"] = {k.decode(): int(v) for k, v in shared.items()}
+    except redis.RedisError:
+        stats["all"] = None
+    return stats
@@ -1,23 +1,206 @@
-import os
+"""
+OpenRouter chat client shared by every LLM caller in the backend.
+
+- one keep-alive requests.Session per process (pooled TLS connections)
+- connect/read deadlines on every call
+- a semaphore bounding concurrent requests per process
+- retries with exponential backoff and full jitter on 429/5xx and connection errors
+- ask_many() for batches, run on a gevent pool when gevent is patched in, threads otherwise
+- completions cached by request content (see llm_cache); pass use_cache=False to bypass
+- stream_chat() yields the completion as it is generated
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from backend_server.config import Config
+from backend_server.services import llm_cache
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_URL = Config.OPENROUTER_URL
+DEFAULT_MODEL = "gpt-4o-mini"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched("socket")
+    except ImportError:
+        return False
+
+
+class LLMClient:
+    def __init__(self, url=OPENROUTER_URL, api_key=None,
+                 connect_timeout=Config.LLM_CONNECT_TIMEOUT, read_timeout=Config.LLM_READ_TIMEOUT,
+                 max_concurrency=Config.LLM_MAX_CONCURRENCY, max_retries=Config.LLM_MAX_RETRIES,
+                 backoff_base=0.5, backoff_cap=8.0):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key or Config.OPENROUTER_API_KEY}",
+            "Content-Type": "application/json"
+        }
+
+    def _backoff(self, attempt, response):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def max_request_seconds(self):
+        """Upper bound on one post() (a non-streamed call): every attempt times out, plus the backoffs between them."""
+        attempts = self.max_retries + 1
+        return attempts * sum(self.timeout) + self.max_retries * self.backoff_cap
+
+    def post(self, payload, stream=False):
+        """
+        POST a chat completion payload, retrying 429/5xx and connection errors.
+        Raises requests exceptions once retries are exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            response, error = None, None
+            with self._semaphore:
+                try:
+                    response = self.session.post(self.url, headers=self._headers(), json=payload,
+                                                 timeout=self.timeout, stream=stream)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+
+            if attempt == self.max_retries:
+                if response is not None:
+                    response.raise_for_status()
+                raise error
+
+            delay = self._backoff(attempt, response)
+            reason = response.status_code if response is not None else error
+            if response is not None:
+                # Return the connection to the pool (a streamed body is otherwise left unread)
+                response.close()
+            logger.warning("LLM request failed (%s), retry %s/%s in %.2fs",
+                           reason, attempt + 1, self.max_retries, delay)
+            time.sleep(delay)
+
+    def chat(self, messages, model=DEFAULT_MODEL, temperature=0.7, use_cache=True, **params):
+        json_data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            **params,
+        }
+
+        use_cache = use_cache and Config.LLM_CACHE_ENABLED
+        if use_cache:
+            key = llm_cache.cache_key(json_data)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return cached
+
+        data = self.post(json_data).json()
+
+        # The response text is inside choices[0].message.content
+        content = data["choices"][0]["message"]["content"]
+        if use_cache:
+            llm_cache.put(key, content)
+        return content
+
+    def stream_chat(self, messages, model=DEFAULT_MODEL, temperature=0.7, use_cache=True, **params):
+        """
+        Yield the completion text in pieces as OpenRouter streams it (SSE).
+        A cached completion is yielded as a single piece; a streamed one is cached once complete.
+        """
+        json_data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            **params,
+        }
+
+        use_cache = use_cache and Config.LLM_CACHE_ENABLED
+        if use_cache:
+            key = llm_cache.cache_key(json_data)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        # The semaphore covers connection setup; the body is read after it is released
+        response = self.post({**json_data, "stream": True}, stream=True)
+        pieces = []
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                # Blank keep-alives and ": OPENROUTER PROCESSING" comments carry no data
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    pieces.append(delta)
+                    yield delta
+
+        if use_cache:
+            llm_cache.put(key, "".join(pieces))
+
+    def ask(self, prompt, **kwargs):
+        return self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    def ask_many(self, prompts, return_exceptions=False, **kwargs):
+        """
+        Ask several prompts concurrently (bounded by max_concurrency).
+        Results keep the order of prompts. With return_exceptions=True a failed
+        prompt yields its exception instead of raising.
+        """
+        def run(prompt):
+            try:
+                return self.ask(prompt, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        prompts = list(prompts)
+        if _gevent_patched():
+            from gevent.pool import Pool
+            return Pool(self.max_concurrency).map(run, prompts)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(run, prompts))
+
+
+client = LLMClient()
+
+def ask_openrouter(prompt, **kwargs):
+    return client.ask(prompt, **kwargs)
+
+def ask_many(prompts, **kwargs):
+    return client.ask_many(prompts, **kwargs)
+
+def stream_openrouter(prompt, **kwargs):
+    return client.stream_chat([{"role": "user", "content": prompt}], **kwargs)
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-
-def ask_openrouter(prompt):
-    headers = {
-        "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    json_data = {
-        "model": "gpt-4o-mini",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7
-    }
-    response = requests.post(OPENROUTER_URL, headers=headers, json=json_data)
-    response.raise_for_status()
-    data = response.json()
-
-    # The response text is inside choices[0].message.content
-    return data["choices"][0]["message"]["content"]
\ No newline at end of file
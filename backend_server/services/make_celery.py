@@ -12,6 +12,30 @@ def make_celery():
             "backend_server.services.tasks"  # <-- important
         ]
     )
+    # Two queues so slow LLM / OFF / backfill work never sits in front of a scan.
+    # Anything not listed goes to "bulk"; see the Procfile for the worker per queue.
+    tasks = "backend_server.services.tasks."
+    celery.conf.task_default_queue = "bulk"
+    celery.conf.task_routes = {
+        tasks + "fetch_label_details": {"queue": "interactive"},
+        tasks + "get_products_for_essential": {"queue": "interactive"},
+        tasks + "flush_product_bundle": {"queue": "interactive"},  # completes a scan's bundled delivery
+        tasks + "recommend_similar_by_essentials": {"queue": "bulk"},
+        tasks + "recommend_similar_by_essentials_ranked": {"queue": "bulk"},
+        tasks + "recommend_similar_products": {"queue": "bulk"},
+        tasks + "stream_recommendations": {"queue": "bulk"},
+        tasks + "openfoodfacts_request": {"queue": "bulk"},
+        tasks + "refresh_essential_leaderboards": {"queue": "bulk"},
+    }
+    # Prefetch is set per worker on the command line. Late acks (redelivery when
+    # a worker dies) are enabled per task, only on idempotent tasks (see tasks.py).
+    # Picked up when a beat process runs (celery ... beat)
+    celery.conf.beat_schedule = {
+        "refresh-essential-leaderboards": {
+            "task": "backend_server.services.tasks.refresh_essential_leaderboards",
+            "schedule": 10 * 60,
+        },
+    }
     return celery
 
 celery = make_celery()
@@ -0,0 +1,58 @@
+"""
+Redis client manager that publishes Socket.IO message-queue traffic as MessagePack.
+
+python-socketio's RedisManager serializes every emit (pickle or JSON depending
+on the version). Messages published here carry MQ_PREFIX followed by
+MessagePack; anything else on the channel (older processes during a deploy)
+is passed through to the base class decoder unchanged.
+"""
+
+import logging
+
+import socketio
+
+from backend_server.utils import socket_serializer
+
+logger = logging.getLogger(__name__)
+
+MQ_PREFIX = b"MP1:"  # never the first bytes of a pickle (0x80) or JSON message
+
+
+class MessagePackRedisManager(socketio.RedisManager):
+    def __init__(self, url, use_msgpack=True, **kwargs):
+        super().__init__(url, **kwargs)
+        self.use_msgpack = use_msgpack and socket_serializer.msgpack_available()
+
+    def _publish(self, data):
+        # multi-argument emits are tuples, which MessagePack would turn into a list
+        if not self.use_msgpack or isinstance(data.get("data"), tuple):
+            return super()._publish(data)
+        try:
+            message = MQ_PREFIX + socket_serializer.pack(data)
+        except Exception as e:
+            logger.warning("Could not pack %s for the message queue, using default encoding: %s", data.get("method"), e)
+            return super()._publish(data)
+
+        for retries_left in (1, 0):
+            try:
+                if getattr(self, "redis", None) is None or not getattr(self, "connected", True):
+                    self._redis_connect()
+                return self.redis.publish(self.channel, message)
+            except Exception as e:
+                if retries_left:
+                    logger.error("Cannot publish to redis... retrying: %s", e)
+                    self.connected = False
+                else:
+                    logger.error("Cannot publish to redis... giving up: %s", e)
+        return None
+
+    def _listen(self):
+        for message in super()._listen():
+            if isinstance(message, bytes) and message.startswith(MQ_PREFIX):
+                try:
+                    # a dict is handled as-is by the base class listener
+                    yield socket_serializer.unpack(message[len(MQ_PREFIX):])
+                except Exception as e:
+                    logger.error("Dropping undecodable message-queue packet: %s", e)
+                continue
+            yield message
@@ -1,10 +1,21 @@
 import os
 from flask_socketio import SocketIO
 
+from backend_server.config import Config
+from backend_server.services.socketio_manager import MessagePackRedisManager
+
 REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"  # Provided by Railway
 
+# Passed again to init_app(), which would otherwise replace it with a plain RedisManager
+client_manager = MessagePackRedisManager(
+    REDIS_URL,
+    channel="flask-socketio",  # Flask-SocketIO's default channel, so older processes stay compatible
+    use_msgpack=Config.SOCKETIO_MQ_ENCODING == "msgpack",
+)
+
 socketio = SocketIO(
     cors_allowed_origins="*",
     async_mode="gevent",
     message_queue=REDIS_URL,
-)
\ No newline at end of file
+    client_manager=client_manager,
+)
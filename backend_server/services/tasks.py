@@ -12,13 +12,17 @@ import logging
 import json
 import time
 
-# shared socketio reference (the one you already created in socketio_ref)
-from backend_server.services.socketio_ref import socketio
-from backend_server.services.gpt_service import fetch_similar_products
+from backend_server.services.gpt_service import fetch_similar_products, stream_recommendations_by_question
 from backend_server.utils import api_requests
-from backend_server.services.rating_calculators import nih_dsld, openfoodfacts, essential_finder
-from backend_server.utils.socket_emit import emit_with_retry
-from backend_server.utils.search_by_essentials import search_by_essentials
+from backend_server.services.rating_calculators import openfoodfacts, essential_finder
+from backend_server.config import Config
+from backend_server.utils.socket_emit import emit_to_room
+from backend_server.utils.product_bundle import add_to_bundle, flush_bundle
+from backend_server.utils import inflight
+from backend_server.utils.label_source import get_label
+from backend_server.utils.stage_graph import Stage, run_stages
+from backend_server.utils.search_by_essentials import search_by_essentials, search_by_essential_leaderboard
+from backend_server.utils.database_tools.essential_leaderboard import refresh_changed_leaderboards, refresh_leaderboards_for_labels
 
 from backend_server.utils.database_tools.get_ingredients_for_label import get_ingredients_for_label
 from backend_server.utils.database_tools.get_rating import get_ratings_for_id
@@ -26,68 +30,20 @@ from backend_server.utils.database_tools.get_rating import get_ratings_for_id
 logger = logging.getLogger(__name__)
 
 # celery task ---------------------------------------------------------------
-@celery.task
-def fetch_label_details(user_id, product_id, recommend_after=False):
-    """
-    Fetch the /label/{id} data and compute detailed ratings.
-    Emitted event: 'lookup_update' with payload:
-      {
-        product_id: "...",
-        rating: 4.2,
-        categories: [{name, score, rating, detail}, ...],
-        raw_label: { ... }   # optional: include raw label for debugging / optional UI details
-      }
-    """
-    try:
-        logger.info("Fetching label details for id=%s (emit to room=%s)", product_id, user_id)
-        r = api_requests.get(f"https://api.ods.od.nih.gov/dsld/v9/label/{product_id}", timeout=15)
-        r.raise_for_status()
-        label = r.json()
-    except Exception as e:
-        logger.exception("Failed to fetch label %s: %s", product_id, e)
-        try:
-            socketio.emit("lookup_update_error", {"room": user_id, "data": {"product_id": product_id, "error": str(e)}}, room=user_id)
-        except Exception:
-            logger.exception("Failed to emit lookup_update_error")
-        return None
-
-    # Calculate and send essentials
-    essential_info = {}
-    try:
-        #essential_info = essential_finder.classify_ingredients_with_gpt(label)
-        essential_info = get_ingredients_for_label(product_id)
-        assert essential_info["essentials"] or essential_info["non_essentials"]
-        if essential_info["essentials"] == None:
-            essential_info["essentials"] = []
-        if essential_info["non_essentials"] == None:
-            essential_info["non_essentials"] = []
-
-        socketio.emit("essentials", {"room": user_id, "data": essential_info}, room=user_id)
-    except Exception as e:
-        logger.exception("Failed to calculate essentials %s: %s", product_id, e)
-        try:
-            socketio.emit("essentials_error", {"room": user_id, "data": {"product_id": product_id, "error": str(e)}}, room=user_id)
-        except:
-            logger.exception("Failed to emit essentials_error")
-    
-    # compute categories / rating
-    categories = nih_dsld.compute_category_scores(label)
-    overall = nih_dsld.compute_overall_rating(categories)
-
-    ratings = get_ratings_for_id(product_id)
+def _essentials_for_label(product_id):
+    essential_info = get_ingredients_for_label(product_id)
+    assert essential_info["essentials"] or essential_info["non_essentials"]
+    if essential_info["essentials"] == None:
+        essential_info["essentials"] = []
+    if essential_info["non_essentials"] == None:
+        essential_info["non_essentials"] = []
+    return essential_info
+
+def _lookup_payload(product_id, label, ratings):
     db_categories = ratings.get("categories", []) if ratings else []
     db_overall = ratings.get("overall_score") if ratings else None
 
-    #print("RATINGS BELOW")
-    #print(f"RATINGS: {ratings}")
-
-    #print("RATINGS END")
-
-    #print("CATEGORIES BELOW")
-    #print(f"CATS: {categories}")
-    #print("CATEGORIES END")
-
-    payload = {
+    return {
         "product_id": str(product_id),
         "rating": db_overall,
         "categories": db_categories,
@@ -98,20 +54,145 @@ def fetch_label_details(user_id, product_id, recommend_after=False):
         # "raw_label": label,  # optional: include raw label if you want the frontend to show more details
     }
 
-    # emit to the user's room
+def _deliver(event, payload, room, product_id, bundle=False):
+    """Emit an event, or collect it into the (room, product) product_bundle when the client opted in."""
+    if not bundle:
+        emit_to_room(event, payload, room=room)
+        return
     try:
-        #time.sleep(1)
-        logger.info("Emitting lookup_update to room=%s", user_id)
-        socketio.emit("lookup_update", {"room": user_id, "data": payload}, room=user_id)
+        schedule = add_to_bundle(room, product_id, event, payload["data"])
     except Exception as e:
-        logger.exception("Failed to emit lookup_update: %s", e)
-        return None
-    
-    if recommend_after:
-        #recommend_similar_products.delay(str(user_id), str(product_id), payload["name"], payload["brand"])
-        #recommend_similar_by_essentials.delay(str(user_id), essential_info["essentials"])
+        logger.warning("Could not bundle %s for room=%s, emitting directly: %s", event, room, e)
+        emit_to_room(event, payload, room=room)
+        return
+    if not schedule:
+        return
+    try:
+        flush_product_bundle.apply_async((room, str(product_id)), countdown=Config.PRODUCT_BUNDLE_WINDOW)
+    except Exception as e:
+        # Nothing would ever flush this window: clear its marker and send what is pending now
+        logger.warning("Could not schedule bundle flush for room=%s, flushing now: %s", room, e)
+        try:
+            flush_bundle(room, product_id)
+        except Exception:
+            logger.exception("Failed to flush product bundle for %s in room=%s", product_id, room)
+            emit_to_room(event, payload, room=room)
+
+def _fan_out(task_name, product_id, token, event, data, room, bundle=False):
+    """
+    Deliver a coalesced task's event to every room subscribed to its run (just
+    `room` if Redis is unavailable or the claim has passed to a newer run).
+    """
+    try:
+        subscribers = inflight.publish(task_name, product_id, token, event, data)
+    except Exception as e:
+        logger.warning("Could not publish %s for in-flight %s:%s: %s", event, task_name, product_id, e)
+        subscribers = None
+    if subscribers is None:
+        subscribers = [(room, bundle)]
+    for subscriber_room, subscriber_bundle in subscribers:
+        _deliver(event, {"room": subscriber_room, "data": data}, subscriber_room, product_id, subscriber_bundle)
+
+def enqueue_coalesced(task, product_id, room, *args, **kwargs):
+    """
+    Enqueue task(*args, **kwargs) for product_id unless the same task is already
+    in flight for it; then subscribe `room` to that run and replay what it has
+    emitted so far (as a product_bundle when kwargs has bundle=True).
+    Returns True when a new task was enqueued.
+    """
+    task_name = task.name.rsplit(".", 1)[-1]
+    bundle = bool(kwargs.get("bundle"))
+    try:
+        token, events = inflight.claim_or_subscribe(task_name, product_id, room, bundle)
+    except Exception as e:
+        logger.warning("In-flight claim failed for %s:%s, enqueueing directly: %s", task_name, product_id, e)
+        task.delay(*args, **kwargs)
+        return True
 
-        recommend_similar_by_essentials_ranked.delay(str(user_id), essential_info["essentials"], n=10, exclude=str(product_id))
+    if token:
+        try:
+            task.delay(*args, coalesce=token, **kwargs)
+        except Exception:
+            inflight.release(task_name, product_id, token)
+            raise
+        return True
+
+    logger.info("%s for %s already in flight; subscribed room=%s (%s events replayed)", task_name, product_id, room, len(events))
+    for event, data in events:
+        _deliver(event, {"room": room, "data": data}, room, product_id, bundle)
+    return False
+
+# celery task ---------------------------------------------------------------
+@celery.task(acks_late=True, reject_on_worker_lost=True)  # idempotent: safe to redeliver
+def fetch_label_details(user_id, product_id, recommend_after=False, bundle=False, coalesce=None):
+    """
+    Fetch the /label/{id} data and compute detailed ratings.
+    The label, essentials and ratings reads run concurrently; each event is
+    emitted as soon as its inputs are ready, and recommendations are queued
+    as soon as the essentials are known.
+    With bundle=True the events are coalesced into 'product_bundle' (see utils/product_bundle).
+    With coalesce=<claim token> (set by enqueue_coalesced) every event goes to all rooms
+    subscribed to this product's in-flight run, and the claim is released at the end
+    (by the chained recommendation task when recommend_after is set).
+    Emitted event: 'lookup_update' with payload:
+      {
+        product_id: "...",
+        rating: 4.2,
+        categories: [{name, score, rating, detail}, ...],
+        raw_label: { ... }   # optional: include raw label for debugging / optional UI details
+      }
+    """
+    logger.info("Fetching label details for id=%s (emit to room=%s)", product_id, user_id)
+
+    def send(event, data):
+        if coalesce:
+            _fan_out("fetch_label_details", product_id, coalesce, event, data, user_id, bundle)
+        else:
+            _deliver(event, {"room": user_id, "data": data}, user_id, product_id, bundle)
+
+    def load_label():
+        label_record = get_label(product_id)
+        logger.info("Label %s freshness: %s", product_id, label_record.freshness())
+        return label_record.label
+
+    def emit_error(event):
+        def on_error(e):
+            logger.error("Stage for %s failed for %s: %r", event, product_id, e)
+            send(event, {"product_id": product_id, "error": str(e)})
+        return on_error
+
+    def on_essentials(essential_info):
+        send("essentials", essential_info)
+        if recommend_after:
+            #recommend_similar_products.delay(str(user_id), str(product_id), payload["name"], payload["brand"])
+            if coalesce:
+                inflight.retain("fetch_label_details", product_id, coalesce)
+            try:
+                recommend_similar_by_essentials_ranked.delay(str(user_id), essential_info["essentials"], n=10, exclude=str(product_id), bundle=bundle,
+                                                             inflight_task="fetch_label_details" if coalesce else None,
+                                                             inflight_token=coalesce)
+            except Exception:
+                if coalesce:
+                    inflight.release("fetch_label_details", product_id, coalesce)
+                raise
+
+    def on_lookup_update(payload):
+        logger.info("Emitting lookup_update to room=%s", user_id)
+        send("lookup_update", payload)
+
+    try:
+        run_stages([
+            Stage("label", load_label, timeout=20),
+            Stage("essentials", lambda: _essentials_for_label(product_id), timeout=10,
+                  on_done=on_essentials, on_error=emit_error("essentials_error")),
+            Stage("ratings", lambda: get_ratings_for_id(product_id), timeout=10),
+            Stage("lookup_update", lambda label, ratings: _lookup_payload(product_id, label, ratings),
+                  deps=("label", "ratings"),
+                  on_done=on_lookup_update, on_error=emit_error("lookup_update_error")),
+        ])
+    finally:
+        if coalesce:
+            inflight.release("fetch_label_details", product_id, coalesce)
     return None
 
 @celery.task
@@ -165,7 +246,7 @@ def recommend_similar_by_essentials(user_id, essentials):
     except Exception as e:
         logger.exception("Failed to recommend similar products by essentials: %s", e)
         try:
-            socketio.emit("recommend_similar_products_error", {"room": user_id, "data": {"error": str(e)}}, room=user_id)
+            emit_to_room("recommend_similar_products_error", {"room": user_id, "data": {"error": str(e)}}, room=user_id)
         except Exception:
             logger.exception("Failed to emit recommend_similar_products_error")
         return None
@@ -173,7 +254,7 @@ def recommend_similar_by_essentials(user_id, essentials):
     # Emit recommendations to the user's room
     try:
         logger.info("Emitting recommend_similar_products to room=%s", user_id)
-        socketio.emit("recommend_similar_products", {"room": user_id, "data": recommendations}, room=user_id)
+        emit_to_room("recommend_similar_products", {"room": user_id, "data": recommendations}, room=user_id)
     except Exception as e:
         logger.exception("Failed to emit recommend_similar_products: %s", e)
 
@@ -181,9 +262,12 @@ def recommend_similar_by_essentials(user_id, essentials):
 
 
 @celery.task
-def recommend_similar_by_essentials_ranked(user_id, essentials, n=10, exclude=None):
+def recommend_similar_by_essentials_ranked(user_id, essentials, n=10, exclude=None, bundle=False, inflight_task=None, inflight_token=None):
     """
     USING DATABASE: Recommend similar products based on the given essentials list.
+    With bundle=True (and exclude set to the scanned product) the result joins that product's 'product_bundle'.
+    With inflight_task/inflight_token set, the result goes to every room subscribed
+    to that task's in-flight run for `exclude`, and this task releases its hold on the claim.
     Emitted event: 'recommend_similar_products' with payload:
       {
         user_id: "...",
@@ -191,6 +275,12 @@ def recommend_similar_by_essentials_ranked(user_id, essentials, n=10, exclude=No
       }
     """
 
+    def send(event, data):
+        if inflight_task:
+            _fan_out(inflight_task, exclude, inflight_token, event, data, user_id, bundle)
+        else:
+            _deliver(event, {"room": user_id, "data": data}, user_id, exclude, bundle and exclude is not None)
+
     try:
         logger.info("DATABASE: Recommending similar products by essentials (emit to room=%s)", user_id)
         recommendations = search_by_essentials(essentials, n=n, exclude=exclude)
@@ -200,17 +290,23 @@ def recommend_similar_by_essentials_ranked(user_id, essentials, n=10, exclude=No
     except Exception as e:
         logger.exception("Failed to recommend similar products by essentials: %s", e)
         try:
-            socketio.emit("recommend_similar_products_error", {"room": user_id, "data": {"error": str(e)}}, room=user_id)
+            send("recommend_similar_products_error", {"error": str(e)})
         except Exception:
             logger.exception("Failed to emit recommend_similar_products_error")
+        finally:
+            if inflight_task:
+                inflight.release(inflight_task, exclude, inflight_token)
         return None
 
     # Emit recommendations to the user's room
     try:
         logger.info("Emitting recommend_similar_products to room=%s", user_id)
-        socketio.emit("recommend_similar_products", {"room": user_id, "data": recommendations}, room=user_id)
+        send("recommend_similar_products", recommendations)
     except Exception as e:
         logger.exception("Failed to emit recommend_similar_products: %s", e)
+    finally:
+        if inflight_task:
+            inflight.release(inflight_task, exclude, inflight_token)
 
     return None
 
@@ -233,12 +329,12 @@ def recommend_similar_products(user_id, product_id, product_name, brand_name):
             recommendations = json.loads(recommendations)
         except json.JSONDecodeError as e:
             logger.exception("Failed to parse recommendations JSON: %s", e)
-            socketio.emit("recommend_similar_products_error", {"room": user_id, "data": {"product_id": product_id, "error": "Invalid recommendations format"}}, room=user_id)
+            emit_to_room("recommend_similar_products_error", {"room": user_id, "data": {"product_id": product_id, "error": "Invalid recommendations format"}}, room=user_id)
             return None
     except Exception as e:
         logger.exception("Failed to recommend similar products for %s: %s", product_id, e)
         try:
-            socketio.emit("recommend_similar_products_error", {"room": user_id, "data": {"product_id": product_id, "error": str(e)}}, room=user_id)
+            emit_to_room("recommend_similar_products_error", {"room": user_id, "data": {"product_id": product_id, "error": str(e)}}, room=user_id)
         except Exception:
             logger.exception("Failed to emit recommend_similar_products_error")
         return None
@@ -246,17 +342,31 @@ def recommend_similar_products(user_id, product_id, product_name, brand_name):
     # Emit recommendations to the user's room
     try:
         logger.info("Emitting recommend_similar_products to room=%s", user_id)
-        socketio.emit("recommend_similar_products", {"room": user_id, "data": recommendations}, room=user_id)
+        emit_to_room("recommend_similar_products", {"room": user_id, "data": recommendations}, room=user_id)
     except Exception as e:
         logger.exception("Failed to emit recommend_similar_products: %s", e)
 
     return None
 
 @celery.task
-def openfoodfacts_request(user_id, upc):
+def openfoodfacts_request(user_id, upc, coalesce=None):
     """
     Attempt to fetch product info from OpenFoodFacts database.
+    With coalesce=<claim token> (set by enqueue_coalesced) errors go to every subscribed room.
     """
+    def send(event, data):
+        if coalesce:
+            _fan_out("openfoodfacts_request", upc, coalesce, event, data, user_id)
+        else:
+            emit_to_room(event, {"room": user_id, "data": data}, room=user_id)
+
+    try:
+        return _openfoodfacts_request(user_id, upc, send)
+    finally:
+        if coalesce:
+            inflight.release("openfoodfacts_request", upc, coalesce)
+
+def _openfoodfacts_request(user_id, upc, send):
     try:
         logger.info("Fetching OFF details for id=%s (emit to room=%s)", upc, user_id)
         r = api_requests.get(f"https://world.openfoodfacts.net/api/v2/product/{upc}.json", timeout=15)
@@ -265,21 +375,20 @@ def openfoodfacts_request(user_id, upc):
     except Exception as e:
         logger.exception("Failed to fetch OFF %s: %s", upc, e)
         try:
-            socketio.emit("off_error", {"room": user_id, "data": {"upc": upc, "error": str(e)}}, room=user_id)
+            send("off_error", {"upc": upc, "error": str(e)})
         except Exception:
             logger.exception("Failed to emit off_error")
         return None
 
     if (info["status"] == 0):
         logger.exception("OFF not found!")
-        socketio.emit("off_error", {"room": user_id, "data": {"upc": upc, "error": "Not found"}}, room=user_id)
+        send("off_error", {"upc": upc, "error": "Not found"})
         return None
     
     # compute categories / rating
     cat_and_conf = openfoodfacts.compute_scores(info)
     print(cat_and_conf)
     print(info["product"]["image_url"])
-    #overall = nih_dsld.compute_overall_rating(categories)
 
     """
     payload = {
@@ -297,14 +406,14 @@ def openfoodfacts_request(user_id, upc):
     try:
         #time.sleep(1)
         logger.info("Emitting lookup_update to room=%s", user_id)
-        socketio.emit("lookup_update", {"room": user_id, "data": payload}, room=user_id)
+        emit_to_room("lookup_update", {"room": user_id, "data": payload}, room=user_id)
     except Exception as e:
         logger.exception("Failed to emit lookup_update: %s", e)
     """
 
     return None
 
-@celery.task
+@celery.task(acks_late=True, reject_on_worker_lost=True)  # idempotent: safe to redeliver
 def get_products_for_essential(user_id, essential_name):
     """
     Fetch products related to the given essential from NIH DSLD API.
@@ -344,19 +453,72 @@ def get_products_for_essential(user_id, essential_name):
                 pass
         """
 
-        top_with_essential = search_by_essentials([{"name": essential_name}], n=10)
+        top_with_essential = search_by_essential_leaderboard(essential_name)
         top_with_essential = top_with_essential["recommendations"]
         #logger.info(f"printing top {top_with_essential}")
 
-        top_with_essential_only = search_by_essentials([{"name": essential_name}], n=10, focused=True)
+        top_with_essential_only = search_by_essential_leaderboard(essential_name, focused=True)
         top_with_essential_only = top_with_essential_only["recommendations"]
         
         roomName = str(user_id) + "-e_" + essential_name
         #print(roomName + "room name <---------")
 
-        socketio.emit("e_essential_products", {"room": roomName, "data": {"essential": essential_name, "products": top_with_essential, "products_focused": top_with_essential_only}}, room=roomName)
+        emit_to_room("e_essential_products", {"room": roomName, "data": {"essential": essential_name, "products": top_with_essential, "products_focused": top_with_essential_only}}, room=roomName)
     except Exception as e:
         roomName = str(user_id) + "-e_" + essential_name
         logger.exception("Failed to fetch products for essential %s: %s", essential_name, e)
-        socketio.emit("e_essential_products_error", {"room": roomName, "data": {"essential": essential_name, "error": str(e)}}, room=roomName)
-    return None
\ No newline at end of file
+        emit_to_room("e_essential_products_error", {"room": roomName, "data": {"essential": essential_name, "error": str(e)}}, room=roomName)
+    return None
+
+@celery.task(acks_late=True, reject_on_worker_lost=True)  # idempotent: safe to redeliver
+def flush_product_bundle(room, product_id):
+    """Emit the stage results collected for (room, product) as one 'product_bundle' event."""
+    try:
+        flush_bundle(room, product_id)
+    except Exception as e:
+        logger.exception("Failed to flush product bundle for %s in room=%s: %s", product_id, room, e)
+    return None
+
+@celery.task
+def refresh_essential_leaderboards(label_ids=None):
+    """
+    Incrementally refresh materialized essential leaderboards.
+    With label_ids (e.g. after a data import), refresh every ingredient on those labels;
+    otherwise refresh ingredients whose labels had a rating change since the last run.
+    """
+    try:
+        if label_ids:
+            refresh_leaderboards_for_labels(label_ids)
+        else:
+            count = refresh_changed_leaderboards()
+            logger.info("Refreshed leaderboards for %s labels with changed ratings", count)
+    except Exception as e:
+        logger.exception("Failed to refresh essential leaderboards: %s", e)
+    return None
+
+
+@celery.task
+def stream_recommendations(user_id, question, job_id):
+    """
+    Stream LLM supplement recommendations to the user's room as they are generated.
+    Emitted events:
+      'recommend_partial': {job_id, index, recommendation: {name, rating, link}}
+      'recommend_done':    {job_id, count}
+      'recommend_error':   {job_id, error}
+    """
+    count = 0
+    try:
+        logger.info("Streaming recommendations for job=%s (emit to room=%s)", job_id, user_id)
+        for recommendation in stream_recommendations_by_question(question):
+            emit_to_room("recommend_partial", {"room": user_id, "data": {"job_id": job_id, "index": count, "recommendation": recommendation}}, room=user_id, mailbox=False)
+            count += 1
+    except Exception as e:
+        logger.exception("Failed to stream recommendations for job %s: %s", job_id, e)
+        try:
+            emit_to_room("recommend_error", {"room": user_id, "data": {"job_id": job_id, "error": str(e)}}, room=user_id, mailbox=False)
+        except Exception:
+            logger.exception("Failed to emit recommend_error")
+        return None
+
+    emit_to_room("recommend_done", {"room": user_id, "data": {"job_id": job_id, "count": count}}, room=user_id, mailbox=False)
+    return None
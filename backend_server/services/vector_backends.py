@@ -0,0 +1,299 @@
+"""
+Vector storage backends behind vector_store.vector_search / ingest_documents.
+
+Select one with VECTOR_BACKEND:
+- "chroma": embedded chromadb client (default)
+- "numpy":  exact dot-product search over a normalized float32 matrix in a
+            memory-mapped .npy file, shared zero-copy by every process on the host
+
+Scores are squared L2 distances (lower is better) for both backends; for the
+normalized MiniLM embeddings that is 2 - 2 * cosine similarity.
+"""
+
+import abc
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VectorBackend(abc.ABC):
+    """Minimal interface used by vector_store."""
+
+    @abc.abstractmethod
+    def get_hashes(self, ids):
+        """Return {id: content_hash} for the ids that are already stored."""
+
+    @abc.abstractmethod
+    def upsert(self, ids, texts, embeddings, hashes):
+        """Insert or replace documents."""
+
+    @abc.abstractmethod
+    def query(self, embedding, top_k):
+        """Return [(id, text, score), ...], best match first."""
+
+    def version(self):
+        """Changes whenever stored documents change, including writes from other processes."""
+        return 0
+
+    @contextmanager
+    def batch(self):
+        """
+        Group the writes of one ingest. Yields an object with get_hashes/upsert;
+        backends that rebuild their index publish once when the block exits.
+        """
+        yield self
+
+
+class ChromaBackend(VectorBackend):
+    def __init__(self, collection_name, persist_directory="./chroma_db"):
+        import chromadb
+        from chromadb.config import Settings
+
+        settings = Settings(
+            persist_directory=persist_directory,
+            anonymized_telemetry=False,
+        )
+        client = chromadb.Client(settings)
+        self.collection = client.get_or_create_collection(name=collection_name)
+
+    def get_hashes(self, ids):
+        existing = self.collection.get(ids=list(ids), include=["metadatas"])
+        return {
+            _id: (meta or {}).get("content_hash")
+            for _id, meta in zip(existing["ids"], existing["metadatas"])
+        }
+
+    def upsert(self, ids, texts, embeddings, hashes):
+        self.collection.upsert(
+            ids=list(ids),
+            documents=list(texts),
+            embeddings=[np.asarray(e, dtype=np.float32).tolist() for e in embeddings],
+            metadatas=[{"content_hash": h} for h in hashes],
+        )
+
+    def query(self, embedding, top_k):
+        results = self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=top_k,
+        )
+        return list(zip(results['ids'][0], results['documents'][0], results['distances'][0]))
+
+
+class NumpyMmapBackend(VectorBackend):
+    """
+    Each write produces a new generation: vectors-{gen}.npy plus meta-{gen}.json
+    (ids, texts, hashes), then CURRENT is atomically replaced with the new gen.
+    Readers memory-map the generation named in CURRENT and re-open when it changes,
+    so the OS page cache holds one copy of the matrix for all processes.
+
+    Writes go through batch(): embeddings are staged in a scratch file and the
+    whole ingest is published as one generation, streaming the previous matrix
+    into the new one instead of loading it. The previous generation is kept on
+    disk so a reader that has just read CURRENT can still open its files.
+    """
+
+    KEEP_GENERATIONS = 2  # current + previous
+    COPY_ROWS = 65536  # rows copied per chunk when building a generation
+
+    def __init__(self, directory, collection_name):
+        self.directory = os.path.join(directory, collection_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self._current_path = os.path.join(self.directory, "CURRENT")
+        self._lock = threading.Lock()
+        self._generation = None
+        self._vectors = None
+        self._ids = []
+        self._texts = []
+        self._hashes = []
+        self._positions = {}
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_generation(self):
+        try:
+            with open(self._current_path) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def _load(self, generation):
+        if generation == 0:
+            return None, {"ids": [], "texts": [], "hashes": []}
+        vectors = np.load(self._path(f"vectors-{generation}.npy"), mmap_mode="r")
+        with open(self._path(f"meta-{generation}.json")) as f:
+            return vectors, json.load(f)
+
+    def _refresh(self):
+        generation = self._read_generation()
+        if generation == self._generation:
+            return
+        with self._lock:
+            for attempt in range(3):
+                if generation == self._generation:
+                    return
+                try:
+                    vectors, meta = self._load(generation)
+                    break
+                except FileNotFoundError:
+                    # Superseded and cleaned up between reading CURRENT and opening it
+                    if attempt == 2:
+                        raise
+                    time.sleep(0.05)
+                    generation = self._read_generation()
+            self._vectors = vectors
+            self._ids, self._texts, self._hashes = meta["ids"], meta["texts"], meta["hashes"]
+            self._positions = {_id: i for i, _id in enumerate(self._ids)}
+            self._generation = generation
+            logger.info("Loaded vector index generation %s (%s docs)", generation, len(self._ids))
+
+    def version(self):
+        self._refresh()
+        return self._generation
+
+    def get_hashes(self, ids):
+        self._refresh()
+        return {_id: self._hashes[self._positions[_id]] for _id in ids if _id in self._positions}
+
+    def upsert(self, ids, texts, embeddings, hashes):
+        with self.batch() as batch:
+            batch.upsert(ids, texts, embeddings, hashes)
+
+    @contextmanager
+    def batch(self):
+        batch = _NumpyBatch(self)
+        try:
+            yield batch
+            batch.publish()
+        finally:
+            batch.close()
+
+    def _publish(self, staging, staged, dim):
+        """Write a generation = current one + staged rows; staged is {id: (row, text, hash)}."""
+        # Serialize writers across processes; readers never block
+        with open(self._path("write.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            old_generation = self._generation
+            old_vectors = self._vectors
+            old_count = len(self._ids)
+
+            all_ids, all_texts, all_hashes = list(self._ids), list(self._texts), list(self._hashes)
+            positions = dict(self._positions)
+            targets = []  # (row in new matrix, row in staging)
+            for _id, (row, text, content_hash) in staged.items():
+                if _id in positions:
+                    i = positions[_id]
+                    all_texts[i], all_hashes[i] = text, content_hash
+                else:
+                    i = positions[_id] = len(all_ids)
+                    all_ids.append(_id)
+                    all_texts.append(text)
+                    all_hashes.append(content_hash)
+                targets.append((i, row))
+
+            generation = old_generation + 1
+            tmp_vectors = self._path(f"vectors-{generation}.npy.tmp")
+            matrix = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float32, shape=(len(all_ids), dim))
+            for lo in range(0, old_count, self.COPY_ROWS):
+                hi = min(lo + self.COPY_ROWS, old_count)
+                matrix[lo:hi] = old_vectors[lo:hi]
+            for i, row in targets:
+                matrix[i] = staging[row]
+            matrix.flush()
+            del matrix
+            os.replace(tmp_vectors, self._path(f"vectors-{generation}.npy"))
+
+            with open(self._path(f"meta-{generation}.json"), "w") as f:
+                json.dump({"ids": all_ids, "texts": all_texts, "hashes": all_hashes}, f)
+            tmp_path = self._current_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(generation))
+            os.replace(tmp_path, self._current_path)
+
+            # Keep the previous generation for readers between CURRENT and open;
+            # open mappings of older files stay valid after unlink
+            for old in range(generation - self.KEEP_GENERATIONS, 0, -1):
+                removed = False
+                for name in (f"vectors-{old}.npy", f"meta-{old}.json"):
+                    try:
+                        os.remove(self._path(name))
+                        removed = True
+                    except FileNotFoundError:
+                        pass
+                if not removed:
+                    break
+
+        self._refresh()
+
+    def query(self, embedding, top_k):
+        self._refresh()
+        if self._vectors is None or not len(self._ids):
+            return []
+
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1)
+        sims = self._vectors @ q
+
+        k = min(top_k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self._ids[i], self._texts[i], float(2 - 2 * sims[i])) for i in top]
+
+
+class _NumpyBatch:
+    """Staged writes of one ingest: embeddings go to a scratch file, not into memory."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._staging_path = backend._path(f"staging-{os.getpid()}-{threading.get_ident()}.f32")
+        self._file = open(self._staging_path, "wb")
+        self._staged = {}  # id -> (row in staging file, text, hash); last write wins
+        self._rows = 0
+        self._dim = None
+
+    def get_hashes(self, ids):
+        hashes = self.backend.get_hashes(ids)
+        hashes.update({_id: self._staged[_id][2] for _id in ids if _id in self._staged})
+        return hashes
+
+    def upsert(self, ids, texts, embeddings, hashes):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+        self._dim = embeddings.shape[1]
+
+        self._file.write(np.ascontiguousarray(embeddings).tobytes())
+        for _id, text, content_hash in zip(ids, texts, hashes):
+            self._staged[_id] = (self._rows, text, content_hash)
+            self._rows += 1
+
+    def publish(self):
+        if not self._staged:
+            return
+        self._file.flush()
+        staging = np.memmap(self._staging_path, dtype=np.float32, mode="r", shape=(self._rows, self._dim))
+        self.backend._publish(staging, self._staged, self._dim)
+
+    def close(self):
+        self._file.close()
+        try:
+            os.remove(self._staging_path)
+        except FileNotFoundError:
+            pass
+
+
+def create_backend(name, collection_name, index_dir):
+    if name == "numpy":
+        return NumpyMmapBackend(index_dir, collection_name)
+    if name == "chroma":
+        return ChromaBackend(collection_name)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {name}")
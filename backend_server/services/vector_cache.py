@@ -0,0 +1,82 @@
+"""
+Two-level in-process cache in front of vector_search:
+- query_embeddings: normalized query text -> float32 embedding bytes
+- search_results:   (embedding hash, top_k, collection version) -> result docs
+
+The collection version is bumped whenever documents are written, which retires
+every cached result without having to walk the cache.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from backend_server.config import Config
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+query_embeddings = LRUCache(Config.VECTOR_QUERY_CACHE_SIZE)
+search_results = LRUCache(Config.VECTOR_RESULT_CACHE_SIZE)
+
+_collection_version = 0
+_version_lock = threading.Lock()
+
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+
+def embedding_key(embedding_bytes):
+    return hashlib.sha1(embedding_bytes).hexdigest()
+
+
+def collection_version():
+    return _collection_version
+
+
+def bump_collection_version():
+    """Call after writing to the collection; cached search results become unreachable."""
+    global _collection_version
+    with _version_lock:
+        _collection_version += 1
+
+
+def get_stats():
+    return {
+        "query_embeddings": query_embeddings.stats(),
+        "search_results": search_results.stats(),
+        "collection_version": _collection_version,
+    }
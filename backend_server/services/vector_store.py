@@ -1,35 +1,122 @@
-import chromadb
-from chromadb.config import Settings
+import hashlib
+import logging
+import threading
+import time
+from itertools import islice
 
-from backend_server.services.embeddings import embed_text
+import numpy as np
 
-settings = Settings(
-    persist_directory="./chroma_db",
-    anonymized_telemetry=False,
-)
+from backend_server.config import Config
+from backend_server.services import vector_cache
+from backend_server.services.vector_backends import create_backend
+from backend_server.services.embeddings import embed_text, warmup as warmup_embeddings
 
-client = chromadb.Client(settings)
+logger = logging.getLogger(__name__)
 
 collection_name = "supplement_knowledge"
 
-if collection_name not in [c.name for c in client.list_collections()]:
-    collection = client.create_collection(name=collection_name)
-else:
-    collection = client.get_collection(collection_name)
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Create the configured vector backend on first use (once per process)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(Config.VECTOR_BACKEND, collection_name, Config.VECTOR_INDEX_DIR)
+                logger.info("Using %s vector backend", Config.VECTOR_BACKEND)
+    return _backend
+
+def warmup():
+    """Open the backend and load the embedding model ahead of the first query."""
+    get_backend()
+    warmup_embeddings()
+    logger.info("Vector store warmed up")
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def ingest_documents(docs, batch_size=64):
+    """
+    Stream documents into the collection in batches of at most batch_size.
+    docs: any iterable (e.g. a generator) of dicts with 'id' and 'text' keys
+    Documents whose content hash is unchanged are skipped; the rest are upserted,
+    so re-running an ingest is safe. Returns throughput stats.
+    """
+    backend = get_backend()
+    stats = {"seen": 0, "upserted": 0, "skipped": 0}
+    start = time.time()
+    docs = iter(docs)
+
+    # One batch() per ingest: the numpy backend publishes a single generation at the end
+    with backend.batch() as writer:
+        while True:
+            batch = list(islice(docs, batch_size))
+            if not batch:
+                break
+            stats["seen"] += len(batch)
+
+            # Last occurrence wins if an id repeats within the batch
+            by_id = {d["id"]: d for d in batch}
+            known = writer.get_hashes(list(by_id))
+
+            ids, texts, hashes = [], [], []
+            for _id, d in by_id.items():
+                content_hash = _content_hash(d["text"])
+                if known.get(_id) == content_hash:
+                    continue
+                ids.append(_id)
+                texts.append(d["text"])
+                hashes.append(content_hash)
+
+            stats["skipped"] += len(batch) - len(ids)
+            if ids:
+                writer.upsert(ids, texts, embed_text(texts), hashes)
+                stats["upserted"] += len(ids)
+                vector_cache.bump_collection_version()
+
+            logger.info("Ingested %s docs so far (%s upserted, %s skipped)",
+                        stats["seen"], stats["upserted"], stats["skipped"])
+
+    if stats["upserted"]:
+        vector_cache.bump_collection_version()
+
+    elapsed = time.time() - start
+    stats["seconds"] = round(elapsed, 3)
+    stats["docs_per_sec"] = round(stats["seen"] / elapsed, 1) if elapsed > 0 else None
+    logger.info("Ingest finished: %s", stats)
+    return stats
 
 def add_documents(docs):
     """
     docs: list of dicts with 'id' and 'text' keys
     """
-    texts = [d["text"] for d in docs]
-    ids = [d["id"] for d in docs]
-    embeddings = embed_text(texts).tolist()
-    collection.add(documents=texts, embeddings=embeddings, ids=ids)
+    return ingest_documents(docs)
+
+def _query_embedding(query):
+    """Float32 embedding bytes for a query, cached by normalized query text."""
+    key = vector_cache.normalize_query(query)
+    cached = vector_cache.query_embeddings.get(key)
+    if cached is not None:
+        return cached
+    embedding = np.asarray(embed_text([query])[0], dtype=np.float32).tobytes()
+    vector_cache.query_embeddings.set(key, embedding)
+    return embedding
 
 def vector_search(query, top_k=5):
-    query_emb = embed_text([query]).tolist()[0]
-    results = collection.query(query_embeddings=[query_emb], n_results=top_k)
+    backend = get_backend()
+    query_bytes = _query_embedding(query)
+    cache_key = (vector_cache.embedding_key(query_bytes), top_k,
+                 vector_cache.collection_version(), backend.version())
+    cached = vector_cache.search_results.get(cache_key)
+    if cached is not None:
+        return [dict(doc) for doc in cached]
+
+    query_emb = np.frombuffer(query_bytes, dtype=np.float32)
     docs = []
-    for doc, score, _id in zip(results['documents'][0], results['distances'][0], results['ids'][0]):
+    for _id, doc, score in backend.query(query_emb, top_k):
         docs.append({"text": doc, "score": score, "id": _id})
-    return docs
\ No newline at end of file
+
+    vector_cache.search_results.set(cache_key, [dict(doc) for doc in docs])
+    return docs
@@ -0,0 +1,165 @@
+"""
+LLMClient against a local stand-in for the OpenRouter chat endpoint.
+
+Each test gives the stand-in a handler(prompt, attempt) returning
+(status, headers, delay_seconds); 200 responses echo the prompt.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from backend_server.services.llm_client import LLMClient
+
+
+class StandIn:
+    def __init__(self, handler):
+        self.handler = handler
+        self.attempts = {}  # prompt -> requests seen
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["messages"][0]["content"]
+                with stand_in._lock:
+                    attempt = stand_in.attempts.get(prompt, 0)
+                    stand_in.attempts[prompt] = attempt + 1
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                try:
+                    status, headers, delay = stand_in.handler(prompt, attempt)
+                    time.sleep(delay)
+                    out = json.dumps({"choices": [{"message": {"content": f"echo: {prompt}"}}]}).encode()
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(out)))
+                    self.end_headers()
+                    self.wfile.write(out)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up (timeout test)
+                finally:
+                    with stand_in._lock:
+                        stand_in.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def client(self, **kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        return LLMClient(url=self.url, api_key="test", **kwargs)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(handler):
+        server = StandIn(handler)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_retryable_status_then_succeeds(stand_in, status):
+    server = stand_in(lambda prompt, attempt: (status if attempt < 2 else 200, {}, 0))
+    assert server.client(max_retries=3).ask("hi", use_cache=False) == "echo: hi"
+    assert server.attempts["hi"] == 3
+
+
+def test_gives_up_after_max_retries(stand_in):
+    server = stand_in(lambda prompt, attempt: (503, {}, 0))
+    with pytest.raises(requests.HTTPError):
+        server.client(max_retries=2).ask("hi", use_cache=False)
+    assert server.attempts["hi"] == 3
+
+
+def test_does_not_retry_client_errors(stand_in):
+    server = stand_in(lambda prompt, attempt: (400, {}, 0))
+    with pytest.raises(requests.HTTPError):
+        server.client(max_retries=3).ask("hi", use_cache=False)
+    assert server.attempts["hi"] == 1
+
+
+def test_honors_retry_after(stand_in):
+    server = stand_in(lambda prompt, attempt: (429, {"Retry-After": "1"}, 0) if attempt == 0 else (200, {}, 0))
+    start = time.monotonic()
+    assert server.client(max_retries=1).ask("hi", use_cache=False) == "echo: hi"
+    assert time.monotonic() - start >= 1.0
+
+
+def test_retry_after_is_capped(stand_in):
+    server = stand_in(lambda prompt, attempt: (429, {"Retry-After": "30"}, 0) if attempt == 0 else (200, {}, 0))
+    start = time.monotonic()
+    server.client(max_retries=1, backoff_cap=0.2).ask("hi", use_cache=False)
+    assert time.monotonic() - start < 5
+
+
+def test_read_timeout_applies_per_request(stand_in):
+    server = stand_in(lambda prompt, attempt: (200, {}, 2))
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        server.client(read_timeout=0.2, max_retries=0).ask("slow", use_cache=False)
+    assert time.monotonic() - start < 1.5
+
+
+def test_concurrency_is_bounded(stand_in):
+    server = stand_in(lambda prompt, attempt: (200, {}, 0.1))
+    server.client(max_concurrency=3).ask_many([f"p{i}" for i in range(12)], use_cache=False)
+    assert server.max_in_flight == 3
+
+
+def test_ask_many_keeps_prompt_order(stand_in):
+    # Earlier prompts answer last
+    server = stand_in(lambda prompt, attempt: (200, {}, 0.05 * (8 - int(prompt[1:]))))
+    prompts = [f"p{i}" for i in range(8)]
+    answers = server.client(max_concurrency=8).ask_many(prompts, use_cache=False)
+    assert answers == [f"echo: {p}" for p in prompts]
+
+
+def test_ask_many_return_exceptions(stand_in):
+    server = stand_in(lambda prompt, attempt: (400 if prompt == "bad" else 200, {}, 0))
+    answers = server.client(max_retries=0).ask_many(["a", "bad", "b"], use_cache=False, return_exceptions=True)
+    assert answers[0] == "echo: a" and answers[2] == "echo: b"
+    assert isinstance(answers[1], requests.HTTPError)
+
+
+def test_failed_response_is_closed_before_retry(stand_in, monkeypatch):
+    server = stand_in(lambda prompt, attempt: (503 if attempt == 0 else 200, {}, 0))
+    client = server.client(max_retries=1)
+    responses = []
+    real_post = client.session.post
+
+    def recording_post(*args, **kwargs):
+        response = real_post(*args, **kwargs)
+        closed = []
+        real_close = response.close
+        response.close = lambda: (closed.append(True), real_close())
+        responses.append((response, closed))
+        return response
+
+    monkeypatch.setattr(client.session, "post", recording_post)
+    client.post({"messages": [{"role": "user", "content": "hi"}]}, stream=True).close()
+    assert responses[0][0].status_code == 503 and responses[0][1]
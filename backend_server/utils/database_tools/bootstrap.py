@@ -0,0 +1,37 @@
+"""
+One-time database setup run at startup instead of on the request path.
+Every statement is idempotent, so it is safe for each web and worker process to run it.
+"""
+
+import logging
+
+from backend_server.utils.extensions import db
+from backend_server.utils.database_tools.db_query import db_execute_no_result
+from backend_server.utils.database_tools.essential_leaderboard import LEADERBOARD_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_STATEMENTS = [
+    # Trigram search for /api/essentials/search
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ingredients_name_trgm_idx ON ingredients USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ingredients_human_name_trgm_idx ON ingredients USING gin (human_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ingredients_human_name_lower_idx ON ingredients (lower(human_name))",
+    # Cache invalidation scans (rating cache, essential leaderboards)
+    "CREATE INDEX IF NOT EXISTS ratings_updated_at_idx ON ratings (updated_at)",
+    # Materialized essential leaderboards
+    LEADERBOARD_SCHEMA,
+]
+
+
+def bootstrap_database():
+    """Ensure extensions, indexes and helper tables exist. Needs an app context."""
+    for statement in BOOTSTRAP_STATEMENTS:
+        try:
+            db_execute_no_result(statement)
+        except Exception as e:
+            # Another process may be creating the same object concurrently
+            logger.warning("Bootstrap statement failed (%s): %s", statement, e)
+            db.session.rollback()
+
+    logger.info("Database bootstrap complete")
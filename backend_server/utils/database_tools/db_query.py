@@ -1,4 +1,6 @@
-from sqlalchemy import text
+import re
+
+from sqlalchemy import event, text
 from backend_server.utils.extensions import db
 
 def db_execute_no_result(query, params=None):
@@ -11,4 +13,64 @@ def db_execute(query, params=None):
 
 def db_execute_mappings(query, params=None):
     result = db.session.execute(text(query), params or {})
-    return result.mappings().all()
\ No newline at end of file
+    return result.mappings().all()
+
+
+class PreparedQuery:
+    """
+    A query compiled once at import time.
+    On Postgres it runs as a server-side prepared statement (PREPARE once per
+    pooled connection, then EXECUTE); other dialects run the compiled text().
+
+    params: ordered list of (param_name, postgres_type) used in the query as :param_name
+    """
+
+    def __init__(self, name, sql, params):
+        self.name = name
+        self.param_names = [p for p, _ in params]
+        self.statement = text(sql)
+
+        prepared_sql = sql
+        for i, (param, _) in enumerate(params, start=1):
+            prepared_sql = re.sub(rf"(?<!:):{param}\b", f"${i}", prepared_sql)
+        arg_types = ", ".join(t for _, t in params)
+        self.prepare_statement = text(f"PREPARE {name} ({arg_types}) AS {prepared_sql}")
+        arg_binds = ", ".join(f":{p}" for p in self.param_names)
+        self.execute_statement = text(f"EXECUTE {name} ({arg_binds})")
+
+    def execute(self, params):
+        conn = db.session.connection()
+        if conn.dialect.name != "postgresql":
+            return db.session.execute(self.statement, params)
+
+        # .info lives as long as the DBAPI connection, like the prepared statement
+        prepared = conn.connection.info.setdefault("prepared_queries", set())
+        if self.name not in prepared:
+            db.session.execute(self.prepare_statement)
+            prepared.add(self.name)
+        return db.session.execute(self.execute_statement, params)
+
+
+def db_execute_prepared_mappings(query, params=None):
+    return query.execute(params or {}).mappings().all()
+
+
+
+# Postgres run-time parameters applied once to every new pooled connection
+SESSION_OPTIONS = {
+    "pg_trgm.similarity_threshold": "0.3",
+}
+
+def register_session_options(engine):
+    """Apply SESSION_OPTIONS whenever the pool opens a new Postgres connection."""
+    if engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply_session_options(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SESSION_OPTIONS.items():
+            cursor.execute("SELECT set_config(%s, %s, false)", (name, value))
+        cursor.close()
+        # Commit so the pool's reset-on-return rollback keeps the settings
+        dbapi_connection.commit()
@@ -0,0 +1,185 @@
+"""
+In-process autocomplete over ingredients(name, human_name) for /api/essentials/search.
+
+Combines a sorted prefix index (bisect over normalized keys) with a trigram index that
+mirrors pg_trgm's similarity(), so results match search_essentials without a DB round-trip:
+- exact match on name / human_name returns just that entry
+- otherwise prefix matches (shortest first), then fuzzy matches by similarity
+
+The vocabulary is reloaded in the background every ESSENTIAL_AUTOCOMPLETE_REFRESH_SECONDS,
+or after the process receives ESSENTIAL_AUTOCOMPLETE_RELOAD_SIGNAL.
+"""
+
+import logging
+import re
+import signal
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from flask import current_app
+
+from backend_server.config import Config
+from backend_server.utils.database_tools.db_query import db_execute
+from backend_server.utils.database_tools.normalize_ingredient import normalize_ingredient
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def trigrams(text):
+    """Trigram set as built by pg_trgm: lowercase words padded with two leading and one trailing space."""
+    result = set()
+    for word in _WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def _similarity(common, a, b):
+    union = len(a) + len(b) - common
+    return common / union if union else 0.0
+
+
+class EssentialAutocomplete:
+    def __init__(self, rows):
+        self.entries = [{"name": name, "human_name": human_name} for name, human_name in rows]
+        self.by_name = {}
+        self.by_human_name = {}
+        self.name_trigrams = []
+        self.human_trigrams = []
+        self.trigram_postings = {}
+        prefix_keys = []
+
+        for i, entry in enumerate(self.entries):
+            name, human_name = entry["name"] or "", entry["human_name"] or ""
+            self.by_name.setdefault(name, i)
+            self.by_human_name.setdefault(human_name.lower(), i)
+
+            name_tg, human_tg = trigrams(name), trigrams(human_name)
+            self.name_trigrams.append(name_tg)
+            self.human_trigrams.append(human_tg)
+            for tg in name_tg | human_tg:
+                self.trigram_postings.setdefault(tg, []).append(i)
+
+            for key in {normalize_ingredient(name), normalize_ingredient(human_name)}:
+                if key:
+                    prefix_keys.append((key, i))
+
+        prefix_keys.sort()
+        self.prefix_keys = [k for k, _ in prefix_keys]
+        self.prefix_ids = [i for _, i in prefix_keys]
+        self.built_at = time.time()
+
+    @classmethod
+    def load(cls):
+        start = time.time()
+        rows = db_execute("SELECT name, human_name FROM ingredients")
+        engine = cls(rows)
+        logger.info("Built essential autocomplete: %s ingredients in %.3fs", len(rows), time.time() - start)
+        return engine
+
+    def _prefix(self, prefix, limit):
+        matches = []
+        start = bisect_left(self.prefix_keys, prefix)
+        for pos in range(start, len(self.prefix_keys)):
+            key = self.prefix_keys[pos]
+            if not key.startswith(prefix):
+                break
+            matches.append((len(key), key, self.prefix_ids[pos]))
+        matches.sort()
+        return list(dict.fromkeys(i for _, _, i in matches))[:limit]
+
+    def _fuzzy(self, query, norm_query, limit, min_similarity):
+        name_q, human_q = trigrams(norm_query), trigrams(query)
+        name_common, human_common = Counter(), Counter()
+        for tg in name_q | human_q:
+            for i in self.trigram_postings.get(tg, ()):
+                if tg in name_q and tg in self.name_trigrams[i]:
+                    name_common[i] += 1
+                if tg in human_q and tg in self.human_trigrams[i]:
+                    human_common[i] += 1
+
+        scored = []
+        for i in set(name_common) | set(human_common):
+            sim = max(
+                _similarity(name_common[i], name_q, self.name_trigrams[i]),
+                _similarity(human_common[i], human_q, self.human_trigrams[i]),
+            )
+            if sim > min_similarity:
+                scored.append((-sim, i))
+        scored.sort()
+        return [i for _, i in scored[:limit]]
+
+    def search(self, query, limit=10, min_similarity=0.3):
+        """Same contract as search_essentials: list of {"name", "human_name"} dicts."""
+        if not query:
+            return []
+        norm_query = normalize_ingredient(query)
+
+        exact = self.by_name.get(norm_query)
+        if exact is None:
+            exact = self.by_human_name.get(query.lower())
+        if exact is not None:
+            return [dict(self.entries[exact])]
+
+        ids = self._prefix(norm_query, limit) if norm_query else []
+        if len(ids) < limit:
+            ids += self._fuzzy(query, norm_query, limit, min_similarity)
+        ids = list(dict.fromkeys(ids))[:limit]
+        return [dict(self.entries[i]) for i in ids]
+
+
+_engine = None
+_lock = threading.Lock()
+_refreshing = False
+_reload_requested = False
+
+
+def _refresh(app):
+    global _engine, _refreshing
+    try:
+        with app.app_context():
+            _engine = EssentialAutocomplete.load()
+    except Exception as e:
+        logger.exception("Failed to reload essential autocomplete: %s", e)
+    finally:
+        _refreshing = False
+
+
+def get_autocomplete():
+    """
+    Return the shared engine, building it on first use.
+    A stale engine keeps serving while a background thread reloads it.
+    """
+    global _engine, _refreshing, _reload_requested
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = EssentialAutocomplete.load()
+        return _engine
+
+    stale = time.time() - _engine.built_at > Config.ESSENTIAL_AUTOCOMPLETE_REFRESH_SECONDS
+    if (stale or _reload_requested) and not _refreshing:
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                _reload_requested = False
+                app = current_app._get_current_object()
+                threading.Thread(target=_refresh, args=(app,), daemon=True).start()
+    return _engine
+
+
+def install_reload_signal(signal_name):
+    """Reload the vocabulary on the next search after the process receives signal_name (e.g. "SIGUSR2")."""
+    def _on_signal(signum, frame):
+        global _reload_requested
+        _reload_requested = True
+
+    try:
+        signal.signal(getattr(signal, signal_name), _on_signal)
+        logger.info("Essential autocomplete reloads on %s", signal_name)
+    except (AttributeError, ValueError) as e:
+        logger.warning("Cannot install autocomplete reload signal %s: %s", signal_name, e)
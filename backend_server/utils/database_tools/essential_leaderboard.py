@@ -0,0 +1,114 @@
+"""
+Materialized per-ingredient leaderboards for the essentials page.
+
+For every ingredient we keep the top LEADERBOARD_SIZE labels in two modes:
+- broad:   any label containing the ingredient
+- focused: labels containing it with <= 2 total ingredients
+
+Rows live in essential_leaderboards and are filled on first read, then refreshed
+incrementally for the ingredients whose labels or ratings changed (beat runs
+refresh_essential_leaderboards); rows older than LEADERBOARD_MAX_AGE_SECONDS are
+recomputed on read either way.
+"""
+
+import logging
+
+from backend_server.config import Config
+from backend_server.utils.database_tools.db_query import db_execute, db_execute_no_result
+from backend_server.utils.database_tools.rating_changes import changed_rating_ids
+from backend_server.utils.database_tools.top_by_essentials import top_labels_by_ingredients_fast
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_SIZE = 20
+MODES = {"broad": False, "focused": True}
+LEADERBOARD_WATERMARK_KEY = "leaderboard:watermark"  # rating_changes scan state for the leaderboards
+
+# Created by the startup bootstrap (bootstrap.py)
+LEADERBOARD_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS essential_leaderboards (
+        ingredient_id integer NOT NULL,
+        mode text NOT NULL,
+        label_ids bigint[] NOT NULL,
+        scores double precision[] NOT NULL,
+        refreshed_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (ingredient_id, mode)
+    )
+"""
+
+
+def _compute(ingredient_id, mode):
+    rows = top_labels_by_ingredients_fast([ingredient_id], LEADERBOARD_SIZE, focused=MODES[mode])
+    return [row[0] for row in rows], [float(row[1]) if row[1] is not None else None for row in rows]
+
+
+def _store(ingredient_id, mode, label_ids, scores):
+    db_execute_no_result("""
+        INSERT INTO essential_leaderboards (ingredient_id, mode, label_ids, scores, refreshed_at)
+        VALUES (:ingredient_id, :mode, :label_ids, :scores, now())
+        ON CONFLICT (ingredient_id, mode)
+        DO UPDATE SET label_ids = EXCLUDED.label_ids,
+                      scores = EXCLUDED.scores,
+                      refreshed_at = EXCLUDED.refreshed_at
+    """, {"ingredient_id": ingredient_id, "mode": mode,
+          "label_ids": label_ids, "scores": scores})
+
+
+def refresh_leaderboards(ingredient_ids):
+    """Recompute and store both leaderboards for each ingredient id."""
+    for ingredient_id in ingredient_ids:
+        for mode in MODES:
+            _store(ingredient_id, mode, *_compute(ingredient_id, mode))
+    logger.info("Refreshed leaderboards for %s ingredients", len(ingredient_ids))
+
+
+def refresh_leaderboards_for_labels(label_ids):
+    """Refresh the leaderboards of every ingredient found on the given labels."""
+    if not label_ids:
+        return
+    rows = db_execute("""
+        SELECT DISTINCT unnest(ingredient_ids)
+        FROM labels
+        WHERE id = ANY(:label_ids)
+    """, {"label_ids": [int(lid) for lid in label_ids]})
+    refresh_leaderboards([row[0] for row in rows])
+
+
+def refresh_changed_leaderboards():
+    """
+    Refresh leaderboards for ingredients on labels whose rating changed
+    since the last run. Returns the number of changed labels.
+    """
+    changed = changed_rating_ids(LEADERBOARD_WATERMARK_KEY, _clear_leaderboards)
+    refresh_leaderboards_for_labels(changed)
+    return len(changed)
+
+
+def _clear_leaderboards():
+    # No scan state: stored rows may predate changes we can no longer see,
+    # so drop them and let them refill on first read
+    db_execute_no_result("DELETE FROM essential_leaderboards")
+    logger.info("Leaderboard scan state missing; cleared materialized leaderboards")
+
+
+def get_leaderboard(ingredient_id, focused=False):
+    """
+    Return [(label_id, score), ...] for an ingredient, best first.
+    Missing rows, and rows older than LEADERBOARD_MAX_AGE_SECONDS, are
+    computed and stored on read.
+    """
+    mode = "focused" if focused else "broad"
+    rows = db_execute("""
+        SELECT label_ids, scores,
+               refreshed_at > now() - make_interval(secs => :max_age) AS fresh
+        FROM essential_leaderboards
+        WHERE ingredient_id = :ingredient_id AND mode = :mode
+    """, {"ingredient_id": ingredient_id, "mode": mode, "max_age": Config.LEADERBOARD_MAX_AGE_SECONDS})
+
+    if rows and rows[0][2]:
+        label_ids, scores = rows[0][0], rows[0][1]
+    else:
+        label_ids, scores = _compute(ingredient_id, mode)
+        _store(ingredient_id, mode, label_ids, scores)
+
+    return list(zip(label_ids, scores))
@@ -1,5 +1,6 @@
 # backend_server/utils/top_by_essentials.py (or a similar util module)
 from backend_server.utils.database_tools.db_query import db_execute
+from backend_server.utils.database_tools.ingredient_frequency import sort_by_frequency
 import json
 
 def get_ingredients_for_label(label_id):
@@ -8,49 +9,36 @@ def get_ingredients_for_label(label_id):
     Return 'essentials' and 'non_essentials' lists.
     """
 
-    # Fetch essentials: name and human_name
+    # One statement: non-essentials (stored as JSON text) plus the essentials as a JSON array
     rows = db_execute("""
-        SELECT i.ingredient_id, i.name, i.human_name
-        FROM ingredients i
-        JOIN labels l ON i.ingredient_id = ANY(l.ingredient_ids)
+        SELECT l.non_essentials_raw,
+               (
+                   SELECT json_agg(json_build_array(i.ingredient_id, i.name, i.human_name))
+                   FROM ingredients i
+                   WHERE i.ingredient_id = ANY(l.ingredient_ids)
+               ) AS essentials
+        FROM labels l
         WHERE l.id = :label_id
     """, {"label_id": label_id})
 
-    # Fetch non-essentials (stored as JSON text)
-    rows2 = db_execute("""
-        SELECT non_essentials_raw
-        FROM labels
-        WHERE id = :label_id
-    """, {"label_id": label_id})
+    essentials_rows = rows[0][1] if rows else None
+    if isinstance(essentials_rows, str):
+        essentials_rows = json.loads(essentials_rows)
 
     # Parse essential ingredients into list of dicts
-    essentials = {row[0] : { "name": row[1], "human_name": row[2]} for row in rows} if rows else {}
-
-    # Sort from most to least frequent
-    ingredient_ids = [a for a in essentials.keys()]
-    freqs = db_execute("""
-        SELECT ingredient_id, label_count
-        FROM ingredient_frequency
-        WHERE ingredient_id = ANY(:ingredient_ids)
-    """, {"ingredient_ids": ingredient_ids})
+    essentials = {row[0] : { "name": row[1], "human_name": row[2]} for row in essentials_rows} if essentials_rows else {}
 
-    # Sort by decreasing frequency
-    freqs.sort(key=lambda x: -x[1])
-    sorted_ids = [fid for fid, _ in freqs]
+    # Sort from most to least frequent, using the in-process ingredient_frequency snapshot
+    sorted_ids = sort_by_frequency(essentials.keys())
 
     essentials_sorted = [{"name": essentials[a]["name"], "human_name": essentials[a]["human_name"]} for a in sorted_ids]
 
-    #rarest_id = sorted_ids[0]
-
     # Parse non-essentials
-    non_essentials = rows2[0][0] if rows2 else []
+    non_essentials = rows[0][0] if rows else []
     if isinstance(non_essentials, str):
         try:
             non_essentials = json.loads(non_essentials)
         except json.JSONDecodeError:
             non_essentials = []
 
-    #print("TEST: >", essentials, non_essentials)
-    #print(type(essentials), type(non_essentials))
-
-    return {"essentials": essentials_sorted, "non_essentials": non_essentials}
\ No newline at end of file
+    return {"essentials": essentials_sorted, "non_essentials": non_essentials}
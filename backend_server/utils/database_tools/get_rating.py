@@ -3,9 +3,12 @@
 rating_utils.py
 
 Utility to fetch ratings for a product by ID, using Flask-SQLAlchemy shared DB session.
+Results are cached in Redis (read-through) and invalidated from ratings.updated_at.
 
 Exports:
 - get_ratings_for_id(label_id: str) -> dict | None
+- get_ratings_for_ids(label_ids: list) -> dict[str, dict | None]
+- invalidate_ratings(label_ids: list) -> None
 
 Returned dict format:
 {
@@ -20,9 +23,11 @@ Returned dict format:
 }
 """
 
+import os
 import logging
 import json
 import time
+import redis
 from datetime import datetime, timezone
 from sqlalchemy import text
 
@@ -30,10 +35,21 @@ from sqlalchemy import text
 # Example: if db is defined in backend_server/__init__.py
 #from backend_server import db, create_app
 
-from backend_server.utils.database_tools.db_query import db_execute_mappings
+from backend_server.config import Config
+from backend_server.utils.database_tools.db_query import PreparedQuery, db_execute_prepared_mappings
+from backend_server.utils.database_tools.rating_changes import changed_rating_ids
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+RATING_CACHE_PREFIX = "rating:"
+RATING_WATERMARK_KEY = "rating:watermark"  # rating_changes scan state for this cache
+_last_sync = 0.0
 
 # Category mapping
 CATEGORY_ORDER = [
@@ -96,8 +112,8 @@ def _row_to_result(row_dict):
     return out
 
 
-def get_ratings_for_id(label_id: str):
-    """Return ratings & justifications for a label id, or None if not found."""
+def _build_rating_query(where_clause):
+    """Build the ratings SELECT with one justification join per category."""
     select_fields = [
         "r.id",
         "r.overall_score",
@@ -111,22 +127,168 @@ def get_ratings_for_id(label_id: str):
             f"LEFT JOIN justification_texts jt_{suffix} ON r.{suffix}_just_id = jt_{suffix}.id"
         )
 
-    sql_query = f"""
+    return f"""
     SELECT
       {', '.join(select_fields)}
     FROM ratings r
     {' '.join(join_clauses)}
-    WHERE r.id = :label_id
-    LIMIT 1;
+    WHERE {where_clause}
+    """
+
+
+# Compiled once; the SELECT list and joins never change at runtime
+_RATING_BY_ID = PreparedQuery(
+    "rating_by_id",
+    _build_rating_query("r.id = :label_id") + " LIMIT 1",
+    [("label_id", "bigint")],
+)
+_RATINGS_BY_IDS = PreparedQuery(
+    "ratings_by_ids",
+    _build_rating_query("r.id = ANY(:label_ids)"),
+    [("label_ids", "bigint[]")],
+)
+
+
+def _cache_key(label_id):
+    return f"{RATING_CACHE_PREFIX}{label_id}"
+
+
+def _dumps(result):
+    return json.dumps(result, separators=(",", ":"))
+
+
+def _sync_invalidations():
+    """
+    Drop cached ratings whose row changed since the last shared scan.
+    Runs at most once per RATING_CACHE_SYNC_INTERVAL per process.
     """
+    global _last_sync
+    now = time.monotonic()
+    if now - _last_sync < Config.RATING_CACHE_SYNC_INTERVAL:
+        return
+    _last_sync = now
+
+    try:
+        changed = changed_rating_ids(RATING_WATERMARK_KEY, _reset_rating_cache)
+        if changed:
+            invalidate_ratings(changed)
+            logger.info("Invalidated %s cached ratings", len(changed))
+    except redis.RedisError as e:
+        logger.warning("Rating cache sync skipped, Redis unavailable: %s", e)
+
+
+def _reset_rating_cache():
+    # No scan state: entries of unknown age may be cached, so start from an empty cache
+    logger.info("Rating scan state missing; flushed %s cached ratings", _flush_rating_cache())
+
+
+def _flush_rating_cache():
+    """Delete every cached rating (not the watermark); returns the number of keys removed."""
+    removed = 0
+    batch = []
+    for key in redis_client.scan_iter(match=f"{RATING_CACHE_PREFIX}*", count=1000):
+        if key.decode() == RATING_WATERMARK_KEY:
+            continue
+        batch.append(key)
+        if len(batch) >= 500:
+            removed += redis_client.delete(*batch)
+            batch = []
+    if batch:
+        removed += redis_client.delete(*batch)
+    return removed
+
+
+def invalidate_ratings(label_ids):
+    """Remove cached ratings for the given label ids."""
+    keys = [_cache_key(lid) for lid in label_ids]
+    for i in range(0, len(keys), 500):
+        redis_client.delete(*keys[i:i + 500])
+
 
-    result = db_execute_mappings(sql_query, {"label_id": label_id})
-    print(f"TYPE: {type(result)}")
-    print(result)
+def _fetch_rating(label_id):
+    result = db_execute_prepared_mappings(_RATING_BY_ID, {"label_id": label_id})
+    logger.debug("Ratings row for %s: %s", label_id, result)
     result = result[0] if result else None
     return _row_to_result(result if result else None)
 
 
+def _fetch_ratings(keys):
+    # Label ids are integers in the DB; DSLD ids arrive as strings
+    numeric_ids = sorted({int(k) for k in keys if k.isdigit()})
+
+    rows = []
+    if numeric_ids:
+        rows = db_execute_prepared_mappings(_RATINGS_BY_IDS, {"label_ids": numeric_ids})
+
+    by_id = {str(row["id"]): _row_to_result(row) for row in rows}
+    return {k: by_id.get(k) for k in keys}
+
+
+def get_ratings_for_id(label_id: str):
+    """Return ratings & justifications for a label id, or None if not found."""
+    _sync_invalidations()
+    key = _cache_key(label_id)
+
+    try:
+        cached = redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning("Rating cache unavailable: %s", e)
+        return _fetch_rating(label_id)
+
+    if cached is not None:
+        return json.loads(cached)
+
+    result = _fetch_rating(label_id)
+    try:
+        # Missing ratings are cached too ("null"); an insert bumps updated_at and invalidates it
+        redis_client.setex(key, Config.RATING_CACHE_TTL, _dumps(result))
+    except redis.RedisError as e:
+        logger.warning("Failed to cache rating %s: %s", label_id, e)
+    return result
+
+
+def get_ratings_for_ids(label_ids):
+    """
+    Return ratings & justifications for many label ids, served from one MGET
+    plus a single query for the ids that were not cached.
+    Returns a dict of str(label_id) -> result (None for ids without a rating),
+    in the same order as label_ids.
+    """
+    keys = list(dict.fromkeys(str(lid) for lid in label_ids))
+    if not keys:
+        return {}
+
+    _sync_invalidations()
+
+    try:
+        cached = redis_client.mget([_cache_key(k) for k in keys])
+    except redis.RedisError as e:
+        logger.warning("Rating cache unavailable: %s", e)
+        return _fetch_ratings(keys)
+
+    results = {}
+    missing = []
+    for k, blob in zip(keys, cached):
+        if blob is None:
+            missing.append(k)
+        else:
+            results[k] = json.loads(blob)
+
+    if missing:
+        fetched = _fetch_ratings(missing)
+        results.update(fetched)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for k, result in fetched.items():
+                pipe.setex(_cache_key(k), Config.RATING_CACHE_TTL, _dumps(result))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to cache %s ratings: %s", len(fetched), e)
+
+    logger.debug("Rating cache: %s hits, %s misses", len(keys) - len(missing), len(missing))
+    return {k: results.get(k) for k in keys}
+
+
 # For CLI testing
 if __name__ == "__main__":
     import sys
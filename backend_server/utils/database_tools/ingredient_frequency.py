@@ -0,0 +1,39 @@
+"""
+Process-level snapshot of ingredient_frequency (ingredient_id -> label_count).
+
+The table is small and only changes with data imports, so it is read once and
+reloaded every INGREDIENT_FREQUENCY_REFRESH_SECONDS instead of being queried
+on every scan and recommendation.
+"""
+
+import logging
+import threading
+import time
+
+from backend_server.config import Config
+from backend_server.utils.database_tools.db_query import db_execute
+
+logger = logging.getLogger(__name__)
+
+_frequencies = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_frequencies():
+    """Return the {ingredient_id: label_count} snapshot, reloading it when stale."""
+    global _frequencies, _loaded_at
+    if _frequencies is None or time.monotonic() - _loaded_at > Config.INGREDIENT_FREQUENCY_REFRESH_SECONDS:
+        with _lock:
+            if _frequencies is None or time.monotonic() - _loaded_at > Config.INGREDIENT_FREQUENCY_REFRESH_SECONDS:
+                rows = db_execute("SELECT ingredient_id, label_count FROM ingredient_frequency")
+                _frequencies = {row[0]: row[1] for row in rows}
+                _loaded_at = time.monotonic()
+                logger.info("Loaded ingredient frequency snapshot (%s ingredients)", len(_frequencies))
+    return _frequencies
+
+
+def sort_by_frequency(ingredient_ids, most_frequent_first=True):
+    """Sort ingredient ids by label_count; ids missing from the snapshot count as 0."""
+    frequencies = get_frequencies()
+    return sorted(ingredient_ids, key=lambda i: frequencies.get(i, 0), reverse=most_frequent_first)
@@ -0,0 +1,154 @@
+"""
+In-process inverted index of ingredient_id -> label ids for recommendation queries.
+
+Labels are numbered by rank (best overall_score first), so every posting list is a
+sorted array of ranks and walking it in order yields labels from best to worst score.
+That lets get_top_fast stop as soon as it has N results instead of scanning everything.
+
+The index is loaded from Postgres on first use and rebuilt in the background once it is
+older than Config.LABEL_INDEX_REFRESH_SECONDS. Enable it with LABEL_INDEX_ENABLED=true.
+"""
+
+import heapq
+import logging
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from flask import current_app
+
+from backend_server.config import Config
+from backend_server.utils.database_tools.db_query import db_execute
+
+logger = logging.getLogger(__name__)
+
+
+def _contains(posting, rank):
+    i = bisect_left(posting, rank)
+    return i < len(posting) and posting[i] == rank
+
+
+class LabelIndex:
+    def __init__(self, label_ids, scores, cardinality, postings):
+        self.label_ids = label_ids  # rank -> label id
+        self.scores = scores  # rank -> overall_score (nan when NULL)
+        self.cardinality = cardinality  # rank -> number of ingredients on the label
+        self.postings = postings  # ingredient_id -> sorted array of ranks
+        self.built_at = time.time()
+
+    @classmethod
+    def load(cls):
+        start = time.time()
+        # Same ordering as the SQL queries it replaces (NULL scores sort first on DESC)
+        rows = db_execute("""
+            SELECT l.id, l.ingredient_ids, r.overall_score
+            FROM labels l
+            JOIN ratings r ON l.id = r.id
+            ORDER BY r.overall_score DESC, l.id
+        """)
+
+        label_ids = array("q")
+        scores = array("d")
+        cardinality = array("i")
+        postings = {}
+        for rank, (label_id, ingredient_ids, score) in enumerate(rows):
+            ingredient_ids = ingredient_ids or []
+            label_ids.append(label_id)
+            scores.append(float(score) if score is not None else math.nan)
+            cardinality.append(len(ingredient_ids))
+            for ingredient_id in set(ingredient_ids):
+                postings.setdefault(ingredient_id, []).append(rank)
+
+        postings = {k: array("i", v) for k, v in postings.items()}
+        logger.info("Built label index: %s labels, %s ingredients in %.2fs",
+                    len(label_ids), len(postings), time.time() - start)
+        return cls(label_ids, scores, cardinality, postings)
+
+    def _row(self, rank):
+        score = self.scores[rank]
+        return (self.label_ids[rank], None if math.isnan(score) else score)
+
+    def top_focused(self, ingredient_id, n):
+        """Top N labels containing ingredient_id with <= 2 total ingredients."""
+        results = []
+        for rank in self.postings.get(ingredient_id, ()):
+            if self.cardinality[rank] <= 2:
+                results.append(self._row(rank))
+                if len(results) >= n:
+                    break
+        return results
+
+    def top_overlap(self, ingredient_ids, n):
+        """
+        Top N labels ranked by number of matching ingredient_ids, then score.
+        Same ordering as top_by_essentials.top_labels_by_ingredient_overlap.
+        """
+        lists = [self.postings.get(i, array("i")) for i in set(ingredient_ids)]
+        if not lists:
+            return []
+        lists.sort(key=len)
+
+        # Labels containing every ingredient: walk the shortest list, stop at N
+        full = []
+        shortest, rest = lists[0], lists[1:]
+        for rank in shortest:
+            if all(_contains(p, rank) for p in rest):
+                full.append(rank)
+                if len(full) >= n:
+                    return [self._row(r) for r in full]
+
+        # Not enough full matches: count matches across all posting lists
+        counts = Counter()
+        for posting in lists:
+            counts.update(posting)
+        for rank in full:
+            del counts[rank]
+        partial = heapq.nsmallest(n - len(full), counts.items(), key=lambda item: (-item[1], item[0]))
+        return [self._row(r) for r in full] + [self._row(r) for r, _ in partial]
+
+    def top(self, ingredient_ids, n, focused=False):
+        if not ingredient_ids:
+            return []
+        if focused and len(ingredient_ids) == 1:
+            return self.top_focused(ingredient_ids[0], n)
+        return self.top_overlap(ingredient_ids, n)
+
+
+_index = None
+_lock = threading.Lock()
+_refreshing = False
+
+
+def _refresh(app):
+    global _index, _refreshing
+    try:
+        with app.app_context():
+            _index = LabelIndex.load()
+    except Exception as e:
+        logger.exception("Failed to refresh label index: %s", e)
+    finally:
+        _refreshing = False
+
+
+def get_label_index():
+    """
+    Return the shared index, building it on first use.
+    A stale index keeps serving while a background thread rebuilds it.
+    """
+    global _index, _refreshing
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = LabelIndex.load()
+        return _index
+
+    if time.time() - _index.built_at > Config.LABEL_INDEX_REFRESH_SECONDS and not _refreshing:
+        with _lock:
+            if not _refreshing:
+                _refreshing = True
+                app = current_app._get_current_object()
+                threading.Thread(target=_refresh, args=(app,), daemon=True).start()
+    return _index
@@ -0,0 +1,80 @@
+"""
+Incremental scans of ratings.updated_at for caches derived from ratings
+(the Redis rating cache, the materialized essential leaderboards).
+
+Each consumer keeps its scan state in Redis under its own key:
+- scanned_at: the DB clock when its previous scan started
+- seen:       the (id, updated_at) pairs that scan returned within
+              RATING_CHANGE_OVERLAP_SECONDS of scanned_at
+
+updated_at is the writer's transaction start, so a row can commit after a scan
+that started later than its timestamp. Every scan therefore looks back
+RATING_CHANGE_OVERLAP_SECONDS from the previous scanned_at and skips the pairs
+it already returned, so each change is reported once.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import redis
+
+from backend_server.config import Config
+from backend_server.utils.database_tools.db_query import db_execute
+
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+
+def _load_state(state_key):
+    raw = redis_client.get(state_key)
+    if raw is None:
+        return None
+    try:
+        state = json.loads(raw)
+        return datetime.fromisoformat(state["scanned_at"]), {tuple(pair) for pair in state["seen"]}
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Unreadable rating scan state at %s; starting over", state_key)
+        return None
+
+
+def changed_rating_ids(state_key, reset):
+    """
+    Return the ids of ratings rows changed since the previous call with this
+    state_key. Without a previous state (first run, or Redis lost it) changes
+    may have been missed, so reset() is called to drop everything derived from
+    ratings and [] is returned. Raises redis.RedisError if Redis is unavailable.
+    """
+    scanned_at = db_execute("SELECT clock_timestamp()")[0][0]
+    state = _load_state(state_key)
+    if state is None:
+        since, seen = scanned_at, set()
+    else:
+        since, seen = state
+
+    rows = db_execute("""
+        SELECT id, updated_at
+        FROM ratings
+        WHERE updated_at > CAST(:since AS timestamptz) - make_interval(secs => :overlap)
+    """, {"since": since.isoformat(), "overlap": Config.RATING_CHANGE_OVERLAP_SECONDS})
+
+    horizon = scanned_at - timedelta(seconds=Config.RATING_CHANGE_OVERLAP_SECONDS)
+    changed = []
+    keep = []
+    for label_id, updated_at in rows:
+        pair = (label_id, updated_at.isoformat())
+        if pair not in seen:
+            changed.append(label_id)
+        if updated_at > horizon:
+            keep.append(pair)
+
+    if state is None:
+        reset()
+        changed = []
+
+    redis_client.set(state_key, json.dumps({"scanned_at": scanned_at.isoformat(), "seen": keep}))
+    return changed
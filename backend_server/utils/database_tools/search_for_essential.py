@@ -1,26 +1,23 @@
-from backend_server.utils.database_tools.db_query import db_execute, db_execute_no_result
+from backend_server.utils.database_tools.db_query import db_execute, SESSION_OPTIONS
 from backend_server.utils.database_tools.normalize_ingredient import normalize_ingredient
 
 def search_essentials(query, limit=10, min_similarity=0.3):
     """
     Search for essentials using fuzzy matching.
     Returns a list of dicts: {"name": ..., "human_name": ...}.
-    Requires pg_trgm extension in Postgres.
+    Requires pg_trgm and the trigram indexes created by bootstrap_database().
     """
     if not query:
         return []
 
     norm_query = normalize_ingredient(query)
 
-    # NO CLUE WHY THIS IS NEEDED. if it takes too long, then figure out how to fix (maybe one-off with pyscop?)
-    new = db_execute_no_result("""CREATE EXTENSION IF NOT EXISTS pg_trgm;""")
-
     # 1️⃣ Check for exact match first (either canonical or human_name)
     exact_rows = db_execute("""
         SELECT name, human_name
         FROM ingredients
         WHERE name = :norm_query
-           OR human_name ILIKE :query
+           OR lower(human_name) = lower(:query)
         LIMIT 1
     """, {
         "norm_query": norm_query,
@@ -32,26 +29,29 @@ def search_essentials(query, limit=10, min_similarity=0.3):
         return [{"name": r[0], "human_name": r[1]} for r in exact_rows]
 
     # 2️⃣ Fuzzy search if no exact match
+    # % and <-> use the GIN trigram indexes; % filters on the session threshold
+    if str(min_similarity) != SESSION_OPTIONS["pg_trgm.similarity_threshold"]:
+        db_execute("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)",
+                   {"threshold": str(min_similarity)})
     rows = db_execute("""
-        SELECT name, human_name, GREATEST(
-            similarity(name, :norm_query),
-            similarity(human_name, :query)
-        ) AS sim_score
-        FROM ingredients
-        WHERE similarity(name, :norm_query) > :min_similarity
-           OR similarity(human_name, :query) > :min_similarity
-        ORDER BY sim_score DESC
+        SELECT name, human_name, min(dist) AS dist
+        FROM (
+            SELECT name, human_name, name <-> :norm_query AS dist
+            FROM ingredients
+            WHERE name % :norm_query
+            UNION ALL
+            SELECT name, human_name, human_name <-> :query AS dist
+            FROM ingredients
+            WHERE human_name % :query
+        ) matches
+        GROUP BY name, human_name
+        ORDER BY dist
         LIMIT :limit
     """, {
         "norm_query": norm_query,
         "query": query,
-        "min_similarity": min_similarity,
         "limit": limit
     })
 
     results = [{"name": r[0], "human_name": r[1]} for r in rows]
-    return results
-
-# THIS HAD TO RUN ONCE!
-# new = db_execute_no_result("""CREATE EXTENSION IF NOT EXISTS pg_trgm;""")
-# print("created new thing")
\ No newline at end of file
+    return results
\ No newline at end of file
@@ -1,5 +1,8 @@
 from sqlalchemy import text
+from backend_server.config import Config
 from backend_server.utils.database_tools.db_query import db_execute
+from backend_server.utils.database_tools.label_index import get_label_index
+from backend_server.utils.database_tools.ingredient_frequency import get_frequencies, sort_by_frequency
 from backend_server.utils.database_tools.normalize_ingredient import normalize_ingredient
 
 
@@ -18,10 +21,53 @@ def get_ingredient_ids(names):
     print("-->", names, ids)
     return ids
 
-def top_labels_by_ingredients_fast(ingredient_ids, n, focused=False):
+def top_labels_by_ingredient_overlap(ingredient_ids, n):
+    """
+    Top N labels ranked by how many of ingredient_ids they contain, then by
+    overall_score. Labels containing every ingredient come first, followed by
+    progressively broader matches.
+
+    The full matches come from one indexed @> query with LIMIT; the overlap
+    ranking (which has to score every label sharing any ingredient) only runs
+    when they come up short.
+    """
+    ingredient_ids = list(ingredient_ids)
+    results = db_execute("""
+        SELECT l.id, r.overall_score
+        FROM labels l
+        JOIN ratings r ON l.id = r.id
+        WHERE l.ingredient_ids @> CAST(:ingredient_ids AS int[])
+        ORDER BY r.overall_score DESC
+        LIMIT :n
+    """, {"ingredient_ids": ingredient_ids, "n": n})
+
+    # With one ingredient a partial match is a full match
+    if len(results) >= n or len(ingredient_ids) == 1:
+        return results
+
+    partial = db_execute("""
+        SELECT l.id, r.overall_score
+        FROM labels l
+        JOIN ratings r ON l.id = r.id
+        WHERE l.ingredient_ids && CAST(:ingredient_ids AS int[])
+          AND NOT l.ingredient_ids @> CAST(:ingredient_ids AS int[])
+        ORDER BY (
+            SELECT count(DISTINCT i)
+            FROM unnest(l.ingredient_ids) AS i
+            WHERE i = ANY(:ingredient_ids)
+        ) DESC, r.overall_score DESC
+        LIMIT :n
+    """, {"ingredient_ids": ingredient_ids, "n": n - len(results)})
+    return list(results) + list(partial)
+
+def top_labels_by_ingredients_fast(ingredient_ids, n, focused=False, mode="overlap"):
     """
     Fast search for top N labels containing ALL ingredient_ids.
-    If fewer than N results, drop rarest ingredient and retry.
+
+    mode="overlap" (default): full matches first, then (only if short) labels
+    ranked by number of matching ingredients and score (see
+    top_labels_by_ingredient_overlap).
+    mode="broaden": if fewer than N results, drop rarest ingredient and retry.
 
     Special case:
     If focused=True (and ingredient_ids has one element),
@@ -46,18 +92,17 @@ def top_labels_by_ingredients_fast(ingredient_ids, n, focused=False):
         return results
 
     # --- Normal case ---
-    freqs = db_execute("""
-        SELECT ingredient_id, label_count
-        FROM ingredient_frequency
-        WHERE ingredient_id = ANY(:ingredient_ids)
-    """, {"ingredient_ids": ingredient_ids})
+    if mode == "overlap":
+        return top_labels_by_ingredient_overlap(ingredient_ids, n)
 
-    if not freqs:
+    frequencies = get_frequencies()
+    known_ids = [i for i in ingredient_ids if i in frequencies]
+
+    if not known_ids:
         return []
 
     # Sort by rarity (lowest count = rarest)
-    freqs.sort(key=lambda x: x[1])
-    sorted_ids = [fid for fid, _ in freqs]
+    sorted_ids = sort_by_frequency(known_ids, most_frequent_first=False)
 
     results = []
     current_ids = sorted_ids[:]  # copy
@@ -94,7 +139,7 @@ def top_labels_by_ingredients_fast(ingredient_ids, n, focused=False):
 
     return results
 
-def get_top_fast(ingredients, n=10, focused=False):
+def get_top_fast(ingredients, n=10, focused=False, mode="overlap"):
     """
     Get top N labels matching all (or most) ingredients by name.
     Broadens search automatically if too few matches found.
@@ -106,4 +151,7 @@ def get_top_fast(ingredients, n=10, focused=False):
         print("Some ingredients not found, returning empty result.")
         return []
 
-    return top_labels_by_ingredients_fast(ingredient_ids, n, focused=focused)
\ No newline at end of file
+    if Config.LABEL_INDEX_ENABLED and mode == "overlap":
+        return get_label_index().top(ingredient_ids, n, focused=focused)
+
+    return top_labels_by_ingredients_fast(ingredient_ids, n, focused=focused, mode=mode)
\ No newline at end of file
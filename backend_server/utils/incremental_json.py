@@ -0,0 +1,63 @@
+"""
+Incremental parsing for JSON that arrives in pieces (e.g. streamed LLM tokens).
+"""
+
+import json
+
+
+class ArrayItemStream:
+    """
+    Feed text chunks; get back each object that sits directly inside a JSON array
+    as soon as its closing brace arrives. For '{"recommendations": [{...}, {...}]}'
+    that is every recommendation, one at a time. Text before the first brace
+    (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0  # next character to scan in _text
+        self._stack = []  # open containers: "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._start = None  # offset in _text of the pending array item
+        self._start_depth = None
+
+    def feed(self, chunk):
+        self._text += chunk
+        items = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._start is None and self._stack and self._stack[-1] == "[":
+                    self._start = i
+                    self._start_depth = len(self._stack)
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._start is not None and len(self._stack) == self._start_depth:
+                    try:
+                        items.append(json.loads(text[self._start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = None
+
+        # Keep only what a pending item still needs
+        keep_from = self._start if self._start is not None else len(text)
+        self._text = text[keep_from:]
+        if self._start is not None:
+            self._start = 0
+        self._pos = len(self._text)
+        return items
@@ -0,0 +1,134 @@
+"""
+Coalescing of identical in-flight tasks, keyed on (task name, product id).
+
+The first requester claims ``inflight:{task}:{product}`` and enqueues the task;
+later requesters add their room to the claim's subscriber set and get the
+events emitted so far replayed, instead of enqueueing another copy. The task
+publishes each event with publish(), which appends it to the claim's log and
+returns every subscriber to fan out to. Subscribing and publishing are Lua
+scripts, so both are atomic and every subscriber sees each event
+exactly once: either in its replay or live.
+
+The claim is a hash holding a per-run token and the number of task invocations
+still working for it (a chained recommendation task retain()s it); the last
+release() deletes the claim, its subscribers and its log. INFLIGHT_TTL bounds
+all three if a worker dies. publish/retain/release only act while the claim
+still carries the caller's token, so a run that outlived its claim cannot
+touch the run that re-claimed the product.
+"""
+
+import json
+import logging
+import os
+import uuid
+
+import redis
+
+from backend_server.config import Config
+
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+INFLIGHT_PREFIX = "inflight:"
+
+# KEYS: claim, rooms, log   ARGV: subscriber, ttl, new run token
+# Returns {1, token} when the caller now owns a fresh claim, else {0, events so far}.
+_CLAIM_OR_SUBSCRIBE = redis_client.register_script("""
+local fresh = 0
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'token', ARGV[3], 'holders', 1)
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('DEL', KEYS[2], KEYS[3])
+    fresh = 1
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if fresh == 1 then
+    return {1, ARGV[3]}
+end
+return {0, redis.call('LRANGE', KEYS[3], 0, -1)}
+""")
+
+# KEYS: claim, rooms, log   ARGV: token, record, ttl
+# Returns the subscribers, or false when the claim now belongs to another run.
+_PUBLISH = redis_client.register_script("""
+if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] then
+    return false
+end
+redis.call('RPUSH', KEYS[3], ARGV[2])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return redis.call('SMEMBERS', KEYS[2])
+""")
+
+# KEYS: claim   ARGV: token, ttl
+_RETAIN = redis_client.register_script("""
+if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'holders', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+""")
+
+# KEYS: claim, rooms, log   ARGV: token
+_RELEASE = redis_client.register_script("""
+if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] then
+    return 0
+end
+if redis.call('HINCRBY', KEYS[1], 'holders', -1) <= 0 then
+    redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+end
+return 1
+""")
+
+
+def _keys(task_name, product_id):
+    base = f"{INFLIGHT_PREFIX}{task_name}:{product_id}"
+    return [base, f"{base}:rooms", f"{base}:log"]
+
+
+def claim_or_subscribe(task_name, product_id, room, bundle=False):
+    """
+    Returns (token, []) when the caller must run the task (token identifies this
+    run and is passed to publish/retain/release), or (None, [(event, data), ...])
+    when it is already in flight and `room` has been subscribed to it.
+    """
+    subscriber = json.dumps([room, bool(bundle)])
+    result = _CLAIM_OR_SUBSCRIBE(keys=_keys(task_name, product_id),
+                                 args=[subscriber, Config.INFLIGHT_TTL, uuid.uuid4().hex])
+    if result[0] == 1:
+        token = result[1]
+        return token.decode() if isinstance(token, bytes) else token, []
+    events = []
+    for raw in result[1]:
+        record = json.loads(raw)
+        events.append((record["event"], record["data"]))
+    return None, events
+
+
+def publish(task_name, product_id, token, event, data):
+    """
+    Record an event for late subscribers; returns the (room, bundle) pairs to emit
+    it to, or None if the claim expired and now belongs to another run.
+    """
+    record = json.dumps({"event": event, "data": data}, default=str)
+    members = _PUBLISH(keys=_keys(task_name, product_id), args=[token, record, Config.INFLIGHT_TTL])
+    if members is None:
+        return None
+    return [tuple(json.loads(member)) for member in members]
+
+
+def retain(task_name, product_id, token):
+    """Another task invocation (e.g. a chained recommendation) now works for this run's claim."""
+    _RETAIN(keys=_keys(task_name, product_id)[:1], args=[token, Config.INFLIGHT_TTL])
+
+
+def release(task_name, product_id, token):
+    """Drop one holder; the last one ends the claim so the next request runs the task again."""
+    try:
+        _RELEASE(keys=_keys(task_name, product_id), args=[token])
+    except redis.RedisError as e:
+        logger.warning("Could not release in-flight claim %s:%s: %s", task_name, product_id, e)
@@ -0,0 +1,107 @@
+"""
+Label source for fetch_label_details.
+
+Serves DSLD label JSON from labels.raw_json and only calls the NIH /label/{id}
+endpoint for ids we don't have. Fetched labels are cached in Redis by id
+(NIH_LABEL_CACHE_TTL) rather than inserted into labels: a row there needs the
+derived columns (upc, ingredient_ids, non_essentials_raw) that only the import
+computes. Each result carries where it came from and when it was fetched.
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import redis
+
+from backend_server.config import Config
+from backend_server.utils import api_requests
+from backend_server.utils.database_tools.get_product_json import get_raw_json_by_id
+
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+NIH_API_URL = Config.NIH_API_URL
+
+NIH_LABEL_PREFIX = "label:nih:"  # {"fetched_at": epoch seconds, "label": raw label JSON}
+
+
+@dataclass
+class LabelRecord:
+    label: dict
+    source: str  # "db", "nih_cache" or "nih"
+    fetched_at: Optional[datetime] = None  # when the label was pulled from NIH, if known
+
+    @property
+    def age_seconds(self):
+        if self.fetched_at is None:
+            return None
+        return (datetime.now(timezone.utc) - self.fetched_at).total_seconds()
+
+    def freshness(self):
+        return {
+            "source": self.source,
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "age_seconds": self.age_seconds,
+        }
+
+
+def _cached_nih_label(product_id):
+    try:
+        value = redis_client.get(f"{NIH_LABEL_PREFIX}{product_id}")
+    except redis.RedisError as e:
+        logger.warning("NIH label cache unavailable: %s", e)
+        return None
+    if not value:
+        return None
+    entry = json.loads(value)
+    return LabelRecord(entry["label"], "nih_cache", datetime.fromtimestamp(entry["fetched_at"], tz=timezone.utc))
+
+
+def _fetch_from_nih(product_id):
+    r = api_requests.get(f"{NIH_API_URL}/label/{product_id}", timeout=15)
+    if r is None:
+        raise RuntimeError(f"NIH label request failed for {product_id}")
+    r.raise_for_status()
+    return r.json()
+
+
+def _cache_nih_label(product_id, label):
+    try:
+        redis_client.setex(f"{NIH_LABEL_PREFIX}{product_id}", Config.NIH_LABEL_CACHE_TTL,
+                           json.dumps({"fetched_at": time.time(), "label": label}))
+    except redis.RedisError as e:
+        logger.warning("Could not cache NIH label %s: %s", product_id, e)
+
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    def get_label(product_id):
+        """Without a local DB every label comes from the NIH API."""
+        return LabelRecord(_fetch_from_nih(product_id), "nih", datetime.now(timezone.utc))
+else:
+    def get_label(product_id):
+        """
+        Return a LabelRecord for product_id, reading labels.raw_json first and
+        falling back to the NIH label cache, then the NIH API, for unknown ids.
+        """
+        label = get_raw_json_by_id(product_id)
+        if label:
+            logger.info("[LABELS] label %s served from DB", product_id)
+            return LabelRecord(label, "db")
+
+        record = _cached_nih_label(product_id)
+        if record:
+            logger.info("[LABELS] label %s served from NIH label cache", product_id)
+            return record
+
+        logger.info("[LABELS] label %s not in DB, fetching from NIH", product_id)
+        label = _fetch_from_nih(product_id)
+        _cache_nih_label(product_id, label)
+        return LabelRecord(label, "nih", datetime.now(timezone.utc))
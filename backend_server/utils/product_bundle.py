@@ -0,0 +1,88 @@
+"""
+Coalesced delivery of scan results as one 'product_bundle' event.
+
+Clients that opt in (``bundle: true`` on /lookup or /lookupbyid) get the stage
+results of a scan (essentials, lookup_update, recommend_similar_products and
+their *_error events) collected per (room, product) for PRODUCT_BUNDLE_WINDOW
+seconds and sent as a single event:
+
+    {
+      "room": "...",
+      "data": {
+        "product_id": "...",
+        "version": 2,                      # increases per flush for this (room, product)
+        "updates": {"recommend_similar_products": [...]}   # only what changed since the previous version
+      }
+    }
+
+Every event name in "updates" carries the same "data" the individual event
+would have carried, so clients merge deltas by version. Clients without the
+flag keep receiving the individual events.
+"""
+
+import json
+import logging
+import os
+
+import redis
+
+from backend_server.config import Config
+from backend_server.utils.socket_emit import emit_to_room
+
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+BUNDLE_PREFIX = "bundle:"  # bundle:{room}:{product_id} -> hash of event name -> JSON data
+
+
+def _keys(room, product_id):
+    base = f"{BUNDLE_PREFIX}{room}:{product_id}"
+    return base, f"{base}:scheduled", f"{base}:version"
+
+
+def add_to_bundle(room, product_id, event, data):
+    """
+    Record one stage result in the pending bundle.
+
+    Returns True when the caller must schedule a flush (the first result of a
+    window); later results in the same window ride along with that flush.
+    """
+    pending, scheduled, _ = _keys(room, product_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(pending, event, json.dumps(data, default=str))
+    pipe.expire(pending, Config.PRODUCT_BUNDLE_TTL)
+    pipe.set(scheduled, 1, nx=True, ex=Config.PRODUCT_BUNDLE_TTL)
+    _, _, first = pipe.execute()
+    return bool(first)
+
+
+def flush_bundle(room, product_id):
+    """Emit everything collected for (room, product) as the next bundle version."""
+    pending, scheduled, version_key = _keys(room, product_id)
+
+    # Take the pending results and reopen the window in one transaction, so a
+    # result arriving after this point schedules the next flush itself.
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hgetall(pending)
+    pipe.delete(pending, scheduled)
+    updates, _ = pipe.execute()
+
+    if not updates:
+        return None
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.incr(version_key)
+    pipe.expire(version_key, Config.PRODUCT_BUNDLE_TTL)
+    version, _ = pipe.execute()
+
+    data = {
+        "product_id": str(product_id),
+        "version": version,
+        "updates": {k.decode() if isinstance(k, bytes) else k: json.loads(v) for k, v in updates.items()},
+    }
+    logger.info("Emitting product_bundle v%s (%s) to room=%s", version, ", ".join(data["updates"]), room)
+    emit_to_room("product_bundle", {"room": room, "data": data}, room=room)
+    return version
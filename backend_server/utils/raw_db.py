@@ -86,6 +86,13 @@ class SpoofedResponse:
     def raise_for_status(self):
         return
 
+# In-process hit/miss counters for the UPC lookup cache
+_cache_stats = {"hits": 0, "misses": 0, "not_found": 0}
+
+def get_cache_stats():
+    """Return a snapshot of the UPC lookup cache counters for this process."""
+    return dict(_cache_stats)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     def get_label_by_upc(upc: str):
@@ -94,57 +101,50 @@ if not DATABASE_URL:
 else:
     def get_label_by_upc(upc: str):
         """
-        Fetch a label row by UPC, using Redis cache.
+        Fetch a label by UPC, using Redis cache.
         Independent of the existing API caching.
-        """
-        # Use a distinct key prefix to avoid collisions with your API cache
-        logging.info("Using real DB for barcode lookup.")
-        label_json = None
 
+        The cache holds the already transformed search-filter shape, so a hit
+        returns without touching Postgres. Only a miss reads the labels table.
+        """
         upc = upc.replace("%20", " ")
 
-        cache_key = f"label:upc:{upc}"
+        # Distinct key prefix: older entries under label:upc: hold raw_json
+        cache_key = f"label:upc:t:{upc}"
 
         # 1️⃣ Check Redis first
-        cached = redis_client.get(cache_key)
+        try:
+            cached = redis_client.get(cache_key)
+        except redis.RedisError as e:
+            logging.warning(f"[LABELS] Redis unavailable for UPC {upc}: {e}")
+            cached = None
+
         if cached:
+            _cache_stats["hits"] += 1
             logging.info(f"[LABELS] UPC {upc} fetched from cache")
-            label_json = json.loads(cached)
-            
+            return SpoofedResponse(json.loads(cached))
 
-        """
-        # 2️⃣ Fetch from PostgreSQL if not cached
-        with conn.cursor() as cur:
-            cur.execute("SELECT raw_json FROM labels WHERE upc = %s", (upc,))
-            row = cur.fetchone()
-            if row is None:
-                logging.info(f"[LABELS] UPC {upc} not found")            
-            else:
-                label_json = row[0]
-        """
+        _cache_stats["misses"] += 1
 
-        query = "SELECT raw_json FROM labels WHERE upc = :upc"
-        rows = db_execute(query, {"upc": upc})
+        # 2️⃣ Fetch from PostgreSQL if not cached
+        rows = db_execute("SELECT raw_json FROM labels WHERE upc = :upc LIMIT 1", {"upc": upc})
 
-        if not rows:
+        if not rows or not rows[0][0]:
+            _cache_stats["not_found"] += 1
             logging.info(f"[LABELS] UPC {upc} not found")
             return None
-        logging.info(f"[LABELS] upc {upc} fetched from DB")
 
-        # rows is a list of Row objects (use ._mapping for dict-style access if needed)
-        label_json = rows[0][0]  # or rows[0]._mapping['raw_json']
+        label_json = rows[0][0]
+        if isinstance(label_json, str):
+            label_json = json.loads(label_json)
 
-        # 3️⃣ Cache the result in Redis
-        if label_json:
-            redis_client.setex(cache_key, CACHE_EXPIRE, json.dumps(label_json))
-            logging.info(f"[LABELS] UPC {upc} fetched from DB and cached")
-        
         label_json = transform_record(label_json)
 
-        logging.info(f"JSON 1: {label_json}")
-        j2 = api_requests.get(NIH_API_URL + f"/search-filter?q=%22{upc}%22", timeout=15)
-        j2 = j2.json()
-        logging.info(f"JSON 2: {j2}")
+        # 3️⃣ Cache the transformed result in Redis
+        try:
+            redis_client.setex(cache_key, CACHE_EXPIRE, json.dumps(label_json))
+            logging.info(f"[LABELS] UPC {upc} fetched from DB and cached")
+        except redis.RedisError as e:
+            logging.warning(f"[LABELS] Failed to cache UPC {upc}: {e}")
 
-        
         return SpoofedResponse(label_json)
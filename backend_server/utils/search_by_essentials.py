@@ -8,8 +8,10 @@ from decimal import Decimal
 
 from backend_server.utils import api_requests
 from backend_server.config import Config
+from backend_server.utils.extensions import db
 from backend_server.utils.database_tools.db_query import db_execute
-from backend_server.utils.database_tools.top_by_essentials import get_top_fast
+from backend_server.utils.database_tools.top_by_essentials import get_top_fast, get_ingredient_ids
+from backend_server.utils.database_tools.essential_leaderboard import get_leaderboard
 from backend_server.utils.database_tools.get_product_json import get_raw_json_by_ids
 
 # --- Redis setup (reuse same Redis instance) ---
@@ -21,12 +23,76 @@ NIH_API_URL = Config.NIH_API_URL
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
-    def search_by_essentials(essentials):
+    def search_by_essentials(essentials, n=10, focused=False, exclude=None):
         logging.info("Using internet for search by essentials. COMPLETEME")
         # COMPLETE ME
         #return api_requests.get(NIH_API_URL + f"/search-filter?q=%22{upc}%22", timeout=15)
+        return {"recommendations": []}
+
+    def search_by_essential_leaderboard(essential_name, focused=False):
+        return search_by_essentials([{"name": essential_name}], focused=focused)
 else:    
 
+    def convert_decimals(obj):
+        if isinstance(obj, list):
+            return [convert_decimals(i) for i in obj]
+        elif isinstance(obj, dict):
+            return {k: convert_decimals(v) for k, v in obj.items()}
+        elif isinstance(obj, Decimal):
+            return float(obj)
+        return obj
+
+    def recommendations_from_top(top20, exclude=None):
+        """
+        Turn [(label_id, score), ...] into the recommendations payload,
+        skipping the excluded id and duplicate name+brand entries.
+        """
+        top20_json = get_raw_json_by_ids([pid for pid, _ in top20]) # dict: id->json
+
+        top20_scores = {pid: score for pid, score in top20}
+
+        recommendations = []
+        for product_id, product_json in top20_json.items():
+            if not product_json:
+                continue
+
+            if isinstance(product_json, str):
+                try:
+                    product_json = json.loads(product_json)
+                except Exception as e:
+                    logging.warning(f"Invalid JSON for id {product_id}: {e}")
+                    continue
+            
+            if exclude and str(exclude) == str(product_id):
+                # Don't recommend an item in its own description
+                continue
+
+            recommendations.append({
+                "id": str(product_id),
+                "name": product_json.get("fullName"),
+                "brand": product_json.get("brandName"),
+                "image": product_json.get("thumbnail"),
+                "score": top20_scores.get(product_id)
+            })
+        
+        results_new = []
+
+        products_already_listed = []
+
+        for hit in recommendations:
+            try:
+                if hit["name"] + hit["brand"] in products_already_listed:
+                    continue
+                else:
+                    products_already_listed.append(hit["name"] + hit["brand"])
+                    results_new.append(hit)
+            except:
+                pass
+        
+        recommendations = convert_decimals(results_new)
+
+        return {"recommendations": recommendations}
+
     def search_by_essentials(essentials, n=10, focused=False, exclude=None):
         """
         Fetch a label row by UPC, using Redis cache. [CACHE DISABLED]
@@ -39,64 +105,32 @@ else:
         try:
             top20 = get_top_fast(essentials, n=2*n, focused=focused)
             
-            top20_json = get_raw_json_by_ids([pid for pid, _ in top20]) # dict: id->json
-
-            top20_scores = {pid: score for pid, score in top20}
-
-            recommendations = []
-            for product_id, product_json in top20_json.items():
-                if not product_json:
-                    continue
-
-                if isinstance(product_json, str):
-                    try:
-                        product_json = json.loads(product_json)
-                    except Exception as e:
-                        logging.warning(f"Invalid JSON for id {product_id}: {e}")
-                        continue
-                
-                if exclude and str(exclude) == str(product_id):
-                    # Don't recommend an item in its own description
-                    continue
+            recommendations = recommendations_from_top(top20, exclude=exclude)
+        except Exception as e:
+            logging.error(f"Error during search_by_essentials: {e}")
+            db.session.rollback()
+            recommendations = {"recommendations": []}
 
-                recommendations.append({
-                    "id": str(product_id),
-                    "name": product_json.get("fullName"),
-                    "brand": product_json.get("brandName"),
-                    "image": product_json.get("thumbnail"),
-                    "score": top20_scores.get(product_id)
-                })
-            
-            results_new = []
+        return recommendations
 
-            products_already_listed = []
 
-            for hit in recommendations:
-                try:
-                    if hit["name"] + hit["brand"] in products_already_listed:
-                        continue
-                    else:
-                        products_already_listed.append(hit["name"] + hit["brand"])
-                        results_new.append(hit)
-                except:
-                    pass
-            
-            recommendations = results_new
-
-            def convert_decimals(obj):
-                if isinstance(obj, list):
-                    return [convert_decimals(i) for i in obj]
-                elif isinstance(obj, dict):
-                    return {k: convert_decimals(v) for k, v in obj.items()}
-                elif isinstance(obj, Decimal):
-                    return float(obj)
-                return obj
-            
-            recommendations = convert_decimals(recommendations)
+    def search_by_essential_leaderboard(essential_name, focused=False):
+        """
+        Top products for a single essential, read from the materialized
+        essential_leaderboards table (see essential_leaderboard.py).
+        Falls back to the live search_by_essentials query if the table can't be read.
+        """
+        logging.info("Using essential leaderboard for essential top product lookup.")
 
-            recommendations = {"recommendations": recommendations}
+        try:
+            ingredient_ids = get_ingredient_ids([essential_name])
+            if not ingredient_ids:
+                return {"recommendations": []}
+            top20 = get_leaderboard(ingredient_ids[0], focused=focused)
+            recommendations = recommendations_from_top(top20)
         except Exception as e:
-            logging.error(f"Error during search_by_essentials: {e}")
-            recommendations = {"recommendations": []}
+            logging.error(f"Error during search_by_essential_leaderboard, using live query: {e}")
+            db.session.rollback()
+            recommendations = search_by_essentials([{"name": essential_name}], focused=focused)
 
         return recommendations
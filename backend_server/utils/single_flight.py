@@ -0,0 +1,134 @@
+"""
+Distributed single-flight for expensive cache fills.
+
+The first caller for a key takes a Redis lock and runs compute(); concurrent callers
+subscribe to the key's channel and wait (up to a deadline) for the winner's result
+instead of repeating the work. Results must be JSON-serializable.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+# Delete the lock only if we still own it
+_RELEASE_LOCK = redis_client.register_script("""
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+""")
+
+
+def _keys(key):
+    return f"sf:lock:{key}", f"sf:result:{key}", f"sf:done:{key}"
+
+
+def _acquire(key, lock_ttl):
+    """Take the lock for key; returns our token, or None if another caller holds it."""
+    lock_key, result_key, _ = _keys(key)
+    token = uuid.uuid4().hex
+    if not redis_client.set(lock_key, token, nx=True, px=int(lock_ttl * 1000)):
+        return None
+    try:
+        redis_client.delete(result_key)  # never hand out a previous flight's result
+    except redis.RedisError:
+        _release(key, token)
+        raise
+    return token
+
+
+def _release(key, token):
+    try:
+        _RELEASE_LOCK(keys=[_keys(key)[0]], args=[token])
+    except redis.RedisError as e:
+        logger.warning("single_flight(%s) could not release lock: %s", key, e)
+
+
+def _publish(key, message, result_ttl=None):
+    _, result_key, channel = _keys(key)
+    try:
+        pipe = redis_client.pipeline()
+        if result_ttl:
+            pipe.setex(result_key, result_ttl, message)
+        pipe.publish(channel, message)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("single_flight(%s) could not publish result: %s", key, e)
+
+
+def _run_as_leader(key, token, compute, result_ttl):
+    """
+    Run compute() while holding the lock and hand the result to waiters.
+    Redis errors after compute() are only logged: the value is already paid for.
+    """
+    try:
+        value = compute()
+    except Exception:
+        _publish(key, json.dumps({"ok": False}))
+        raise
+    else:
+        _publish(key, json.dumps({"ok": True, "value": value}), result_ttl)
+        return value
+    finally:
+        _release(key, token)
+
+
+def single_flight(key, compute, deadline=30, lock_ttl=60, result_ttl=30):
+    """
+    Return compute() for key, running it at most once at a time across all processes.
+
+    Waiters give up after `deadline` seconds and run compute() themselves. If the
+    winner fails or dies, the next waiter to notice takes over the lock. Without
+    Redis (taking the lock fails) compute() runs uncoordinated.
+    """
+    try:
+        token = _acquire(key, lock_ttl)
+    except redis.RedisError as e:
+        logger.warning("single_flight(%s) without Redis: %s", key, e)
+        return compute()
+    if token:
+        return _run_as_leader(key, token, compute, result_ttl)
+
+    lock_key, result_key, channel = _keys(key)
+    end = time.monotonic() + deadline
+    token = None
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(channel)
+        while time.monotonic() < end:
+            # The winner may have finished before we subscribed
+            cached = redis_client.get(result_key)
+            if cached is not None:
+                return json.loads(cached)["value"]
+
+            message = pubsub.get_message(timeout=min(1.0, max(0.0, end - time.monotonic())))
+            if message and message["type"] == "message":
+                data = json.loads(message["data"])
+                if data["ok"]:
+                    return data["value"]
+
+            # Winner failed or its lock expired: take over
+            if not redis_client.exists(lock_key):
+                token = _acquire(key, lock_ttl)
+                if token:
+                    break
+    except redis.RedisError as e:
+        logger.warning("single_flight(%s) lost Redis while waiting: %s", key, e)
+    finally:
+        pubsub.close()
+
+    if token:
+        return _run_as_leader(key, token, compute, result_ttl)
+
+    logger.warning("single_flight(%s) deadline passed, computing locally", key)
+    return compute()
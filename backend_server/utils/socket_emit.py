@@ -1,35 +1,177 @@
-import threading
+import json
 import logging
+import os
+
+import redis
+
+from backend_server.config import Config
 from backend_server.services.socketio_ref import socketio
+from backend_server.utils.socket_serializer import JSON, MSGPACK, encode_payload
 
 logger = logging.getLogger(__name__)
 
+# --- Redis setup (reuse same Redis instance) ---
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+redis_client = redis.from_url(REDIS_URL)
+
+MAILBOX_PREFIX = "socket:mailbox:"  # list of pending {"event", "payload"} records per room
+MEMBERS_PREFIX = "socket:members:"  # hash of sid -> negotiated encoding for sids joined to a room
+MSGPACK_ROOM_SUFFIX = ":mp"  # sockets that negotiated MessagePack join room + suffix instead of room
+
+# Rooms this web process holds sockets in -> their sids. Their members hashes are
+# kept alive by the heartbeat below; a restarted or crashed process stops
+# refreshing them, so its stale sids expire after SOCKET_MEMBERS_TTL.
+_local_members = {}
+_heartbeat_started = False
+
+
+def _mailbox_key(room):
+    return f"{MAILBOX_PREFIX}{room}"
+
+
+def _members_key(room):
+    return f"{MEMBERS_PREFIX}{room}"
+
+
+# KEYS: members, mailbox   ARGV: record, max entries, ttl
+# Mailbox the event only while nobody has joined the room: a joined client gets it live.
+_MAILBOX_IF_UNJOINED = redis_client.register_script("""
+if redis.call('HLEN', KEYS[1]) > 0 then
+    return 0
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+""")
+
+
+def socket_room(room, encoding):
+    """Socket.IO room a socket with this encoding joins for `room`."""
+    return room + MSGPACK_ROOM_SUFFIX if encoding == MSGPACK else room
+
+
+def base_room(name):
+    """Inverse of socket_room."""
+    return name[:-len(MSGPACK_ROOM_SUFFIX)] if name.endswith(MSGPACK_ROOM_SUFFIX) else name
+
+
+def emit_to_room(event, payload, room, namespace="/", mailbox=True):
+    """
+    Emit to a room; while no client has joined it yet, also keep a copy in the
+    room's mailbox for SOCKET_MAILBOX_TTL seconds.
+
+    Workers cannot see which clients are connected (rooms live in the web
+    process), so joins are tracked in Redis (socket:members:{room}, expiring
+    unless the web process holding the socket keeps refreshing it). A client
+    that joins its room after the task emitted gets the mailbox replayed by the
+    join_room handler. Pass mailbox=False for rooms that are never joined with
+    join_room (e.g. the bare user room).
+
+    Encoding is negotiated per socket: sockets that asked for MessagePack sit in
+    socket_room(room, "msgpack") and get the payload as binary; the rest get
+    JSON in `room`. Each variant is only published if a member uses it.
+    """
+    encodings = {JSON}
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        if mailbox:
+            record = json.dumps({"event": event, "payload": payload}, default=str)
+            _MAILBOX_IF_UNJOINED(keys=[_members_key(room), _mailbox_key(room)],
+                                 args=[record, Config.SOCKET_MAILBOX_MAX, Config.SOCKET_MAILBOX_TTL],
+                                 client=pipe)
+        pipe.hvals(_members_key(room))
+        members = pipe.execute()[-1]
+        if members:
+            encodings = {value.decode() for value in members}
+    except (redis.RedisError, TypeError, ValueError) as e:
+        logger.warning("Could not store event=%s for room=%s in mailbox: %s", event, room, e)
+        encodings = {JSON, MSGPACK}  # members unknown: reach both kinds of socket
+
+    for encoding in encodings:
+        try:
+            socketio.emit(event, encode_payload(payload, encoding), room=socket_room(room, encoding), namespace=namespace)
+        except Exception as e:
+            logger.exception("Failed to emit %s: %s", event, e)
+
+
+def _refresh_members():
+    """Push back the expiry of every members hash this process has sockets in."""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for room in list(_local_members):
+            pipe.expire(_members_key(room), Config.SOCKET_MEMBERS_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not refresh socket members: %s", e)
+
+
+def _members_heartbeat():
+    while True:
+        socketio.sleep(Config.SOCKET_MEMBERS_TTL / 3)
+        try:
+            _refresh_members()
+        except Exception as e:
+            logger.exception("Socket members heartbeat failed: %s", e)
+
+
+def _ensure_heartbeat():
+    global _heartbeat_started
+    if not _heartbeat_started:
+        _heartbeat_started = True
+        socketio.start_background_task(_members_heartbeat)
+
+
+def join_and_drain(room, sid, encoding=JSON):
+    """
+    Record that sid joined room with `encoding` and atomically take every event
+    mailboxed before that; returns [(event, payload), ...]. From here on events
+    go out live only.
+    """
+    key = _mailbox_key(room)
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hset(_members_key(room), sid, encoding)
+        pipe.expire(_members_key(room), Config.SOCKET_MEMBERS_TTL)
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        _, _, records, _ = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not drain mailbox for room=%s: %s", room, e)
+        return []
+    _local_members.setdefault(room, set()).add(sid)
+    _ensure_heartbeat()
+
+    events = []
+    for raw in records:
+        try:
+            record = json.loads(raw)
+            events.append((record["event"], record["payload"]))
+        except (ValueError, KeyError):
+            continue
+    return events
+
+
+def leave(rooms, sid):
+    """sid left these rooms (leave_room or disconnect); empty rooms start mailboxing again."""
+    for room in rooms:
+        sids = _local_members.get(base_room(room))
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del _local_members[base_room(room)]
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for room in rooms:
+            pipe.hdel(_members_key(base_room(room)), sid)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not record sid %s leaving %s: %s", sid, rooms, e)
+
+
 def emit_with_retry(event, payload, room, max_attempts=5, delay=1, namespace="/"):
     """
-    Try to emit to a room. If the room has no connected clients, retry up to max_attempts.
-    Non-blocking: uses threading.Timer.
+    Kept for older call sites: delivery to late joiners is now handled by the
+    room mailbox, so max_attempts and delay are ignored.
     """
-    attempts = {"count": 0}  # mutable object to track across retries
-
-    def room_has_clients():
-        rooms = socketio.server.manager.rooms.get(namespace, {})
-        print("rooms:", rooms)
-        return room in rooms and len(rooms[room]) > 0
-
-    def try_emit():
-        attempts["count"] += 1
-        if room_has_clients():
-            try:
-                logger.info("Emitting event=%s to room=%s (attempt %s)", event, room, attempts["count"])
-                socketio.emit(event, payload, room=room, namespace=namespace)
-            except Exception as e:
-                logger.exception("Failed to emit %s: %s", event, e)
-        else:
-            if attempts["count"] < max_attempts:
-                logger.info("Room %s not connected yet. Retrying in %s seconds...", room, delay)
-                threading.Timer(delay, try_emit).start()
-            else:
-                logger.warning("Max emit attempts reached for event=%s, room=%s", event, room)
-
-    # initial try
-    try_emit()
\ No newline at end of file
+    emit_to_room(event, payload, room, namespace=namespace)
@@ -0,0 +1,91 @@
+"""
+MessagePack encoding for Socket.IO payloads, with JSON as the fallback.
+
+Two hops use it:
+- the Redis message queue between Celery workers and the web worker
+  (services/socketio_manager.MessagePackRedisManager), and
+- the client transport, per socket: a socket that asks for it with
+  ``encoding: "msgpack"`` on connect/join_room gets the payload as one binary
+  attachment to unpack (see socket_emit.socket_room); other sockets in the
+  same room keep getting plain JSON.
+
+msgpack is optional: without it everything stays JSON.
+
+Benchmark (bytes and CPU per emit for typical scan payloads):
+    python -m backend_server.utils.socket_serializer
+"""
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+def negotiate(requested):
+    """Encoding to use for a client that asked for `requested` (None/unknown -> JSON)."""
+    if requested == MSGPACK and msgpack is not None:
+        return MSGPACK
+    return JSON
+
+
+def pack(obj):
+    """MessagePack bytes; values msgpack cannot represent (Decimal, datetime, ...) are sent as str."""
+    return msgpack.packb(obj, use_bin_type=True, default=str)
+
+
+def unpack(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def encode_payload(payload, encoding):
+    """Payload as it should be handed to socketio.emit for a room using `encoding`."""
+    if encoding == MSGPACK and msgpack is not None:
+        return pack(payload)
+    return payload
+
+
+if __name__ == "__main__":
+    import json
+    import pickle
+    import timeit
+
+    if msgpack is None:
+        raise SystemExit("msgpack is not installed")
+
+    categories = [
+        {"name": f"category_{i}", "score": 3.7, "rating": "good",
+         "detail": "Justification text explaining the score in a couple of sentences. " * 3}
+        for i in range(8)
+    ]
+    payloads = {
+        "lookup_update": {"room": "42-0123456789", "data": {
+            "product_id": "123456", "rating": 4.2, "categories": categories,
+            "name": "Vitamin D3 5000 IU", "brand": "Example Brand", "image": "https://example.com/x.jpg"}},
+        "recommend_similar_products": {"room": "42-0123456789", "data": {"recommendations": [
+            {"id": str(100000 + i), "name": f"Product {i}", "brand": "Brand", "image": None,
+             "rating": 4.0 - i / 10, "overall_score": 3.9} for i in range(20)]}},
+    }
+
+    print(f"{'payload':28} {'codec':8} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for name, payload in payloads.items():
+        # message-queue envelope as published by the client manager
+        envelope = {"method": "emit", "event": name, "data": payload, "namespace": "/",
+                    "room": payload["room"], "skip_sid": None, "callback": None, "host_id": "x" * 32}
+        codecs = {
+            "json": (lambda o: json.dumps(o).encode(), json.loads),
+            "pickle": (pickle.dumps, pickle.loads),
+            "msgpack": (pack, unpack),
+        }
+        for codec, (dumps, loads) in codecs.items():
+            blob = dumps(envelope)
+            number = 2000
+            enc = timeit.timeit(lambda: dumps(envelope), number=number) / number * 1e6
+            dec = timeit.timeit(lambda: loads(blob), number=number) / number * 1e6
+            print(f"{name:28} {codec:8} {len(blob):7d} {enc:10.1f} {dec:10.1f}")
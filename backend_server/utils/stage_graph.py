@@ -0,0 +1,108 @@
+"""
+Run a small graph of dependent stages concurrently.
+
+Each stage starts as soon as its dependencies have finished, runs in a worker
+thread with its own Flask app context (and so its own DB session), and has an
+optional deadline. Callbacks run in the calling thread as each stage finishes,
+so results can be emitted immediately instead of after the slowest stage.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimeout(Exception):
+    pass
+
+
+class StageSkipped(Exception):
+    """A dependency failed or timed out, so the stage never ran."""
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable  # called with the results of deps as keyword arguments
+    deps: Tuple[str, ...] = ()
+    timeout: Optional[float] = None  # seconds from when the stage starts
+    on_done: Optional[Callable] = None  # on_done(result)
+    on_error: Optional[Callable] = None  # on_error(exception)
+
+
+def _finish(stage, result, results):
+    results[stage.name] = result
+    callback = stage.on_error if isinstance(result, Exception) else stage.on_done
+    if isinstance(result, Exception) and callback is None:
+        logger.warning("Stage %s failed: %r", stage.name, result)
+    if callback is None:
+        return
+    try:
+        callback(result)
+    except Exception:
+        logger.exception("Callback for stage %s failed", stage.name)
+
+
+def run_stages(stages, max_workers=None):
+    """
+    Run stages, respecting deps and per-stage deadlines.
+    Returns {name: result}; failed, timed-out or skipped stages map to the exception.
+    Must be called inside a Flask app context.
+    """
+    app = current_app._get_current_object()
+
+    def call(stage, kwargs):
+        with app.app_context():
+            return stage.fn(**kwargs)
+
+    results = {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}  # future -> (stage, deadline)
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(stages))
+    try:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                failed = [d for d in stage.deps if isinstance(results.get(d), Exception)]
+                if failed:
+                    del pending[name]
+                    _finish(stage, StageSkipped(f"{failed[0]} failed: {results[failed[0]]}"), results)
+                elif all(d in results for d in stage.deps):
+                    del pending[name]
+                    future = pool.submit(call, stage, {d: results[d] for d in stage.deps})
+                    deadline = time.monotonic() + stage.timeout if stage.timeout else None
+                    running[future] = (stage, deadline)
+
+            if not running:
+                for name, stage in pending.items():
+                    _finish(stage, StageSkipped(f"{name} has unknown deps: {stage.deps}"), results)
+                break
+
+            deadlines = [d for _, d in running.values() if d is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, _ = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                _finish(stage, result, results)
+
+            now = time.monotonic()
+            for future, (stage, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    # The thread can't be killed; stop waiting and let it finish in the background
+                    running.pop(future)
+                    future.cancel()
+                    _finish(stage, StageTimeout(f"{stage.name} exceeded {stage.timeout}s"), results)
+    finally:
+        pool.shutdown(wait=False)
+
+    return results